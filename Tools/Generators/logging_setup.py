@@ -0,0 +1,17 @@
+# Shared logging setup for the command-line tools (generator, builder,
+# importer), so every tool maps --verbosity to the same levels and format.
+
+
+import logging
+
+LOG_LEVELS = {
+    "ERROR": logging.ERROR,
+    "INFO": logging.INFO,
+    "DEBUG": logging.DEBUG
+}
+
+def configure_logging(verbosity):
+    logging.basicConfig(
+        level=LOG_LEVELS.get(verbosity, logging.INFO),
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
@@ -3,27 +3,26 @@
 # Install with: pip install fpdf midiutil music21
 
 
+import io
+import copy
 import json
 import argparse
 import readline
 import os
+import sys
 import datetime
 import logging
+from fractions import Fraction
 from fpdf import FPDF
 from midiutil import MIDIFile
-from music21 import stream, chord, note, metadata, meter, tempo, key, duration
-
-# Configure logging
-def configure_logging(verbosity):
-    log_levels = {
-        "ERROR": logging.ERROR,
-        "INFO": logging.INFO,
-        "DEBUG": logging.DEBUG
-    }
-    logging.basicConfig(
-        level=log_levels.get(verbosity, logging.INFO),
-        format="%(asctime)s - %(levelname)s - %(message)s"
-    )
+from music21 import stream, chord, note, pitch, bar, spanner, expressions, metadata, meter, tempo, key, duration, tie, harmony
+from song_cache import SongCache
+from song_worker import DEFAULT_MAX_RSS_MB, DEFAULT_TIMEOUT, Supervisor
+from timeline import TICKS_PER_QUARTER, build_timeline
+import song_importer
+import song_builder
+from logging_setup import configure_logging
+
 # File validation
 def validate_file_path(file_path, base_dir):
     abs_base_dir = os.path.abspath(base_dir)
@@ -88,113 +87,404 @@ def generate_pdf(song_data, output_path):
         pdf.chapter_body(content)
         pdf.output(output_path)
         logging.info(f"PDF saved to {output_path}")
+        return True
+    except MemoryError:
+        raise
     except Exception as e:
         logging.error(f"Failed to generate PDF: {e}")
+        return False
+
+# Repeat detection
+def group_repeats(progressions):
+    """
+    Group consecutive progressions that can be written once and repeated.
+    Returns (indices, body_length) pairs: the members of a group are identical, or identical
+    apart from their final chord, in which case body_length excludes it and each member's
+    final chord becomes a numbered ending. A progression that returns after a different one
+    starts a new group, so non-consecutive repeats stay written out.
+    """
+    groups = []
+    i = 0
+    while i < len(progressions):
+        first = progressions[i]
+        indices = [i]
+        j = i + 1
+        while first and j < len(progressions):
+            other = progressions[j]
+            if other != first and not (len(first) > 1 and len(other) == len(first) and other[:-1] == first[:-1]):
+                break
+            indices.append(j)
+            j += 1
+        identical = all(progressions[k] == first for k in indices)
+        groups.append((indices, len(first) if identical else len(first) - 1))
+        i = j
+    return groups
+
+def measured_groups(timeline, progressions, indices, body_length, position):
+    """
+    Return the groups to write for one group_repeats() group starting at a written position.
+    Repeat barlines need the body and every ending to fill whole measures; otherwise the
+    sections are written out in full.
+    """
+    measure_ticks = timeline.measure_ticks
+    events = progressions[indices[0]]
+    body_ticks = sum(duration_ticks for _, duration_ticks in events[:body_length])
+    ending_ticks = [progressions[idx][-1][1] for idx in indices] if body_length < len(events) else []
+    if position % measure_ticks == 0 and body_ticks % measure_ticks == 0 and all(t % measure_ticks == 0 for t in ending_ticks):
+        return [(indices, body_length)]
+    return [([idx], len(progressions[idx])) for idx in indices]
+
+# MIDI encoding helpers
+MIDI_TICKS_PER_QUARTER = TICKS_PER_QUARTER
+
+def write_var_length(value):
+    """Serialize an integer as a MIDI variable-length quantity."""
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+def encode_midi_block(events, volume, channel=0):
+    """
+    Encode a run of (chord notes, duration ticks) events as MIDI note events relative to the
+    start of the run. Returns (lead_ticks, event_bytes, tail_ticks): the delta before the first
+    event is left out of event_bytes so a block can be spliced in after any amount of silence.
+    """
+    notes = []
+    start = 0
+    for chord_notes, duration_ticks in events:
+        pitches = list(dict.fromkeys(chord_notes))
+        if pitches:
+            notes.append((start, 0x90, pitches))
+            notes.append((start + duration_ticks, 0x80, pitches))
+        start += duration_ticks
+    # Note-offs sort before note-ons sharing a tick, matching midiutil's ordering
+    notes.sort(key=lambda e: (e[0], e[1] == 0x90))
+    if not notes:
+        return None, b"", start
+    data = bytearray()
+    previous_tick = notes[0][0]
+    for tick, status, pitches in notes:
+        for pitch_val in pitches:
+            if data:
+                data += write_var_length(tick - previous_tick)
+            data += bytes((status | channel, pitch_val, volume))
+            previous_tick = tick
+    return notes[0][0], bytes(data), start - previous_tick
+
+def splice_midi_events(midi_bytes, event_data):
+    """Append raw note events to the last track of a midiutil-written file, before its end-of-track."""
+    track_start = midi_bytes.rindex(b"MTrk")
+    body = midi_bytes[track_start + 8:-4] + event_data + midi_bytes[-4:]
+    return midi_bytes[:track_start] + b"MTrk" + len(body).to_bytes(4, "big") + body
 
-def generate_midi(song_data, output_path):
+def generate_midi(song_data, output_path, timeline=None):
     try:
-        midi_progression = []
-        sections = song_data.get("sections") or []
+        if timeline is None:
+            timeline = build_timeline(song_data)
         midi_chords = song_data.get("midi_chords") or {}
-        if sections and midi_chords:
-            for section in sections:
-                if section is None:
-                    continue
-                for chord_name in section.get("progression") or []:
-                    midi_progression.append(midi_chords.get(chord_name, []))
-        else:
-            midi_progression = song_data.get("midi_progression") or []
-        mf = MIDIFile(1)
+        chord_notes = [
+            chord_name if isinstance(chord_name, tuple) else tuple(midi_chords.get(chord_name) or ())
+            for chord_name in timeline.chord_names
+        ]
+        mf = MIDIFile(1, ticks_per_quarternote=timeline.ticks_per_quarter)
         track = 0
         time = 0
         mf.addTrackName(track, time, "Chords")
-        mf.addTempo(track, time, song_data.get("tempo", 120))
-        duration_val = song_data.get("midi_duration", 1)
+        mf.addTempo(track, time, timeline.tempo)
+        mf.addTimeSignature(track, time, timeline.beats, timeline.beat_type.bit_length() - 1, 24)
         volume = song_data.get("midi_volume", 100)
-        for chord_notes in midi_progression:
-            if chord_notes is None:
-                continue
-            for note_val in chord_notes:
-                mf.addNote(track, 0, note_val, time, duration_val, volume)
-            time += duration_val
+        # Each distinct section is encoded once; repeats reuse the cached bytes at their onset
+        encoded_blocks = {}
+        event_data = bytearray()
+        last_tick = 0
+        for section_index in range(len(timeline.sections)):
+            block_key = timeline.section_events(section_index)
+            if block_key not in encoded_blocks:
+                encoded_blocks[block_key] = encode_midi_block(
+                    [(chord_notes[chord_id], duration_ticks) for chord_id, duration_ticks in block_key], volume)
+            lead_ticks, data, tail_ticks = encoded_blocks[block_key]
+            if data:
+                start, end = timeline.section_span(section_index)
+                event_data += write_var_length(start + lead_ticks - last_tick) + data
+                last_tick = end - tail_ticks
+        buffer = io.BytesIO()
+        mf.writeFile(buffer)
         with open(output_path, "wb") as f:
-            mf.writeFile(f)
+            f.write(splice_midi_events(buffer.getvalue(), bytes(event_data)))
         logging.info(f"MIDI saved to {output_path}")
+        return True
+    except MemoryError:
+        raise
     except Exception as e:
         logging.error(f"Failed to generate MIDI: {e}")
+        return False
+
+# MusicXML construction helpers
+MEASURE_QUARTER_LENGTH = 4
 
-def generate_musicxml(song_data, output_path):
+def get_chord_pitches(chord_notes, chord_name):
+    """
+    Return new music21 pitches for a chord.
+    Handing Chord ready-made Pitch objects avoids its slow path for MIDI numbers; they are built
+    fresh for every chord because export mutates accidental display state on each pitch it writes.
+    """
+    return [pitch.Pitch(n) for n in chord_notes[chord_name]]
+
+def insert_measures(part, measures, measure_length=MEASURE_QUARTER_LENGTH):
+    """Insert measures at precomputed offsets and notify the part of the change once."""
+    for idx, measure in enumerate(measures):
+        part.coreInsert(idx * measure_length, measure)
+    part.coreElementsChanged()
+
+# MusicXML <kind> -> music21 chord kind, where the names differ
+MUSIC21_KINDS = {"dominant": "dominant-seventh", "half-diminished": "half-diminished-seventh"}
+
+def chord_symbol(chord_name):
+    """
+    Return a music21 chord symbol for a chord name, using the importer's chord vocabulary so the
+    name reads back unchanged, or None when the name cannot be spelled.
+    """
+    parts = song_importer.split_chord_name(chord_name)
+    if parts is None:
+        return None
+    root, suffix, bass = parts
+    # music21 spells flats with "-"
+    root, bass = (name[0] + name[1:].replace("b", "-") if name else None for name in (root, bass))
+    kind = song_importer.SUFFIX_KINDS.get(suffix)
     try:
-        chord_notes = song_data.get("midi_chords") or {}
+        if kind is not None:
+            return harmony.ChordSymbol(root=root, bass=bass, kind=MUSIC21_KINDS.get(kind, kind))
+        return harmony.ChordSymbol(root + suffix + (f"/{bass}" if bass else ""))
+    except Exception:
+        return None
+
+def key_signature(key_name):
+    """Return a music21 key for a song key such as "D", "Bb" or "F#m", or None when it cannot be read."""
+    parts = song_importer.split_chord_name(key_name.strip()) if isinstance(key_name, str) else None
+    if parts is None or parts[1] not in ("", "m") or parts[2]:
+        return None
+    tonic, suffix, _ = parts
+    return key.Key(tonic[0] + tonic[1:].replace("b", "-"), "minor" if suffix == "m" else "major")
+
+class MeasureWriter:
+    """
+    Lays timeline events out into measures in written order, splitting a chord that crosses
+    a barline into tied pieces. Chords without a voicing in midi_chords are written as rests.
+    Every event also gets a chord symbol, so readers do not have to name chords from pitches;
+    each symbol is built once per chord and copied per use, which is far cheaper than building it.
+    """
+    def __init__(self, timeline, chord_notes):
+        self.timeline = timeline
+        self.chord_notes = chord_notes
+        self.measures = []
+        self.position = 0
+        self.symbols = {}
+
+    def offset_of(self, position):
+        return Fraction(position % self.timeline.measure_ticks, self.timeline.ticks_per_quarter)
+
+    def measure_at(self, position):
+        index = position // self.timeline.measure_ticks
+        while len(self.measures) <= index:
+            self.measures.append(stream.Measure(number=len(self.measures) + 1))
+        return self.measures[index]
+
+    def write(self, chord_id, duration_ticks, lyrics):
+        """Write one event at the current position; lyrics is a list of (lyric number, text) pairs."""
+        chord_name = self.timeline.chord_names[chord_id]
+        pieces = []
+        if chord_id not in self.symbols:
+            self.symbols[chord_id] = chord_symbol(chord_name)
+        if self.symbols[chord_id] is not None:
+            self.measure_at(self.position).coreInsert(self.offset_of(self.position), copy.deepcopy(self.symbols[chord_id]))
+        while duration_ticks:
+            measure = self.measure_at(self.position)
+            piece_ticks = min(duration_ticks, self.timeline.measure_ticks - self.position % self.timeline.measure_ticks)
+            if self.chord_notes.get(chord_name):
+                element = chord.Chord(get_chord_pitches(self.chord_notes, chord_name))
+            else:
+                element = note.Rest()
+            element.quarterLength = Fraction(piece_ticks, self.timeline.ticks_per_quarter)
+            measure.coreInsert(self.offset_of(self.position), element)
+            pieces.append(element)
+            self.position += piece_ticks
+            duration_ticks -= piece_ticks
+        if len(pieces) > 1 and isinstance(pieces[0], chord.Chord):
+            for idx, piece in enumerate(pieces):
+                piece.tie = tie.Tie("start" if idx == 0 else "stop" if idx == len(pieces) - 1 else "continue")
+        for lyric_number, text in lyrics:
+            pieces[0].addLyric(text, lyricNumber=lyric_number)
+
+    def finish(self):
+        for measure in self.measures:
+            measure.coreElementsChanged()
+        return self.measures
+
+def generate_musicxml(song_data, output_path, timeline=None):
+    try:
+        if timeline is None:
+            timeline = build_timeline(song_data)
+        measure_ticks = timeline.measure_ticks
         score = stream.Score()
         score.insert(0, metadata.Metadata())
         score.metadata.title = song_data.get("title", "Untitled")
-        score.append(tempo.MetronomeMark(number=song_data.get("tempo", 120)))
-        score.append(meter.TimeSignature('4/4'))
-        score.append(key.KeySignature(0))
         part = stream.Part()
-        measure_num = 1
-        sections = song_data.get("sections") or []
-        for section in sections:
-            if section is None:
-                continue
-            lyrics_lines = section.get("lyrics") or []
-            progression = section.get("progression") or []
-            lyric_idx = 0
-            for chord_name in progression:
-                if chord_name in chord_notes:
-                    chord_obj = chord.Chord(chord_notes[chord_name])
-                    chord_obj.quarterLength = 4
-                    if lyric_idx < len(lyrics_lines):
-                        chord_obj.addLyric(lyrics_lines[lyric_idx])
-                        lyric_idx += 1
-                    measure = stream.Measure(number=measure_num)
-                    measure.append(chord_obj)
-                    part.append(measure)
-                    measure_num += 1
+        writer = MeasureWriter(timeline, song_data.get("midi_chords") or {})
+        section_indices = [idx for idx, (_, first, end, _) in enumerate(timeline.sections) if end > first]
+        sections = [timeline.sections[idx] for idx in section_indices]
+        progressions = [timeline.section_events(idx) for idx in section_indices]
+        # Consecutive repeated sections are written once between repeat barlines,
+        # with one lyric line per pass and numbered endings where the last chord differs
+        for group_indices, group_body_length in group_repeats(progressions):
+            groups = measured_groups(timeline, progressions, group_indices, group_body_length, writer.position)
+            for indices, body_length in groups:
+                progression = progressions[indices[0]]
+                lyric_sets = [sections[idx][3] for idx in indices]
+                body_start = writer.position
+                # Section titles become a rehearsal mark, like the "%%" title line in ABC
+                group_title = " / ".join(sections[idx][0] or "" for idx in indices)
+                if group_title.strip(" /"):
+                    writer.measure_at(body_start).insert(writer.offset_of(body_start), expressions.RehearsalMark(group_title))
+                for pos in range(body_length):
+                    lyrics = [
+                        (pass_num, lyric_set[pos])
+                        for pass_num, lyric_set in enumerate(lyric_sets, 1)
+                        if pos < len(lyric_set)
+                    ]
+                    writer.write(*progression[pos], lyrics)
+                if len(indices) == 1:
+                    continue
+                writer.measure_at(body_start).leftBarline = bar.Repeat(direction="start")
+                if body_length == len(progression):
+                    writer.measure_at(writer.position - 1).rightBarline = bar.Repeat(direction="end", times=len(indices))
+                    continue
+                for pass_num, idx in enumerate(indices, 1):
+                    lyric_set = lyric_sets[pass_num - 1]
+                    lyrics = [(pass_num, lyric_set[body_length])] if body_length < len(lyric_set) else []
+                    ending_start = writer.position
+                    writer.write(*progressions[idx][-1], lyrics)
+                    ending = writer.measures[ending_start // measure_ticks:writer.position // measure_ticks]
+                    if pass_num < len(indices):
+                        ending[-1].rightBarline = bar.Repeat(direction="end")
+                    part.coreInsert(0, spanner.RepeatBracket(ending, number=pass_num))
+        measures = writer.finish()
+        if measures:
+            # Key, meter and tempo live in the first measure so they are exported with it
+            measures[0].insert(0, tempo.MetronomeMark(number=timeline.tempo))
+            measures[0].insert(0, meter.TimeSignature(timeline.meter))
+            song_key = key_signature(song_data.get("key") or (song_data.get("abc_notation") or {}).get("key"))
+            if song_key is not None:
+                measures[0].insert(0, song_key)
+        insert_measures(part, measures, Fraction(measure_ticks, timeline.ticks_per_quarter))
         score.append(part)
         score.write("musicxml", fp=output_path)
         logging.info(f"MusicXML saved to {output_path}")
+        return True
+    except MemoryError:
+        raise
     except Exception as e:
         logging.error(f"Failed to generate MusicXML: {e}")
+        return False
+
+# ABC rendering helpers
+def abc_length(ticks, unit_ticks):
+    """Format a tick length as an ABC note-length suffix in units of L:."""
+    length = Fraction(ticks) / unit_ticks
+    if length == 1:
+        return ""
+    if length.denominator == 1:
+        return str(length.numerator)
+    if length.numerator == 1:
+        return f"/{length.denominator}"
+    return f"{length.numerator}/{length.denominator}"
 
-def generate_abc(song_data, output_path):
+def abc_chord_tokens(timeline, events, position, unit_ticks):
+    """
+    Render (chord id, duration) events as chord symbols over invisible rests, with a barline
+    at every measure boundary. Returns the tokens and the written position after them.
+    """
+    tokens = []
+    for chord_id, duration_ticks in events:
+        chord_name = timeline.chord_names[chord_id]
+        # MIDI number voicings from midi_progression have no name to write
+        symbol = "" if isinstance(chord_name, tuple) else f'"{chord_name}"'
+        while duration_ticks:
+            piece_ticks = min(duration_ticks, timeline.measure_ticks - position % timeline.measure_ticks)
+            tokens.append(f"{symbol}x{abc_length(piece_ticks, unit_ticks)}")
+            symbol = ""
+            position += piece_ticks
+            duration_ticks -= piece_ticks
+            if position % timeline.measure_ticks == 0:
+                tokens.append("|")
+    return tokens, position
+
+def generate_abc(song_data, output_path, timeline=None):
     try:
+        if timeline is None:
+            timeline = build_timeline(song_data)
         abc_notation = song_data.get("abc_notation") or {}
         reference_number = abc_notation.get("reference_number", 1)
         title = abc_notation.get("title", "Untitled")
         composer = abc_notation.get("composer", "Unknown")
-        meter_val = abc_notation.get("meter", "4/4")
         unit_note_length = abc_notation.get("unit_note_length", "1/8")
-        tempo_val = abc_notation.get("tempo", "1/4=120")
         key_val = abc_notation.get("key", "C")
         abc_lines = [
             f"X:{reference_number}",
             f"T:{title}",
             f"C:{composer}",
-            f"M:{meter_val}",
+            f"M:{timeline.meter}",
             f"L:{unit_note_length}",
-            f"Q:{tempo_val}",
+            f"Q:1/4={timeline.tempo}",
             f"K:{key_val}",
         ]
-        for section in abc_notation.get("sections") or []:
-            if section is None:
-                continue
-            abc_lines.append(f"%% {section.get('title', '')}")
-            chords_line = " ".join([f"[{ch}]" for ch in section.get("chords") or []])
-            abc_lines.append(chords_line)
-            lyrics_lines = " | ".join(section.get("lyrics") or [])
-            abc_lines.append(f"w: {lyrics_lines}")
+        unit_ticks = Fraction(unit_note_length) * 4 * timeline.ticks_per_quarter
+        progressions = [timeline.section_events(idx) for idx in range(len(timeline.sections))]
+        position = 0
+        for group_indices, group_body_length in group_repeats(progressions):
+            for indices, body_length in measured_groups(timeline, progressions, group_indices, group_body_length, position):
+                members = [timeline.sections[idx] for idx in indices]
+                progression = progressions[indices[0]]
+                abc_lines.append("%% " + " / ".join(section[0] or "" for section in members))
+                tokens, position = abc_chord_tokens(timeline, progression[:body_length], position, unit_ticks)
+                if len(indices) > 1:
+                    # A repeat sign replaces the barline it lands on
+                    if tokens[-1:] == ["|"]:
+                        tokens.pop()
+                    tokens.insert(0, "|:")
+                    if body_length == len(progression):
+                        tokens.append(":|")
+                    else:
+                        for pass_num, idx in enumerate(indices, 1):
+                            tokens.append(("|" if pass_num == 1 else ":|") + str(pass_num))
+                            ending_tokens, position = abc_chord_tokens(timeline, progressions[idx][-1:], position, unit_ticks)
+                            if ending_tokens[-1:] == ["|"]:
+                                ending_tokens.pop()
+                            tokens += ending_tokens
+                        tokens.append("|")
+                abc_lines.append(" ".join(tokens))
+                for section in members:
+                    lyrics_lines = " | ".join(section[3])
+                    abc_lines.append(f"w: {lyrics_lines}")
         with open(output_path, "w") as f:
             f.write("\n".join(abc_lines))
         logging.info(f"ABC notation saved to {output_path}")
+        return True
+    except MemoryError:
+        raise
     except Exception as e:
         logging.error(f"Failed to generate ABC notation: {e}")
+        return False
 
-def load_song_data(file_path):
+def load_song_data(file_path, cache=None):
+    """Load a song JSON file, expanding any song_builder block references."""
+    if cache is not None:
+        return cache.load(file_path, load_song_data)
     try:
         with open(file_path, "r") as f:
-            return json.load(f)
+            return song_builder.expand_song(json.load(f))
     except FileNotFoundError:
         logging.error(f"File not found: {file_path}")
         raise
@@ -207,14 +497,185 @@ def ensure_directory_exists(directory):
         logging.info(f"Directory '{directory}' not found. Creating it...")
         os.makedirs(directory)
 
-if __name__ == "__main__":
+def build_parser():
     parser = argparse.ArgumentParser(description="Generate PDF, MIDI, and ABC for songs from JSON.")
     parser.add_argument("json_files", nargs="*", help="Paths to JSON files.")
     parser.add_argument("--json_dir", default="./json", help="Directory to search for JSON files.")
     parser.add_argument("--output_dir", default="./output", help="Directory to save output.")
     # TODO: change add -v -vv -vvv options to verbosity
     parser.add_argument("--verbosity", choices=["ERROR", "INFO", "DEBUG"], default="INFO")
-    args = parser.parse_args()
+    parser.add_argument("--overwrite", action="store_true", help="Reuse an existing output folder without asking.")
+    parser.add_argument("--no-parse-cache", dest="parse_cache", action="store_false",
+                        help="Always parse JSON files instead of using the parsed-song cache.")
+    parser.add_argument("--isolate", action="store_true",
+                        help="Render each song in a supervised worker process that is replaced on timeout or memory overrun.")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="Seconds each song may take with --isolate (0 disables).")
+    parser.add_argument("--max-rss-mb", dest="max_rss_mb", type=int, default=DEFAULT_MAX_RSS_MB,
+                        help="Worker resident memory limit in MB with --isolate (0 disables).")
+    return parser
+
+def select_json_files(json_dir):
+    """Prompt for the files to process. Returns None when there is nothing to do."""
+    logging.info(f"Looking in {json_dir}")
+    json_files = [f for f in os.listdir(json_dir) if f.endswith(".json")]
+    if not json_files:
+        logging.error("No JSON files found.")
+        return None
+    print("Available JSON files:")
+    for file in json_files:
+        print(f" - {file}")
+    print("Options:")
+    print("  [1] Enter file names (comma-separated)")
+    print("  [2] Process ALL files in the directory")
+    choice = input("Choose an option [1/2]: ").strip()
+    if choice == '2':
+        confirm = input(f"Are you sure you want to process ALL {len(json_files)} files in '{json_dir}'? (y/n): ").strip().lower()
+        if confirm == 'y':
+            return [os.path.join(json_dir, f) for f in json_files]
+        print("Aborted.")
+        return []
+    selected = input("Enter JSON files (comma-separated): ")
+    return [
+        os.path.abspath(f.strip()) if os.path.isabs(f.strip()) else os.path.normpath(os.path.join(json_dir, f.strip()))
+        for f in selected.split(",")
+    ]
+
+def process_song(json_file, options, caches=None, supervised=False):
+    """
+    Generate every output format for one JSON file and return a result dict.
+    caches maps a directory to its SongCache; pass None to parse the JSON directly.
+    A MemoryError is recorded with limit "memory", or re-raised when supervised so the
+    worker can report the song as over budget.
+    """
+    result = {"file": json_file, "ok": False, "output_dir": None, "outputs": {}, "error": None, "limit": None}
+    try:
+        # Ensure both paths are absolute before comparison
+        abs_json_file = os.path.abspath(json_file)
+        abs_base_dir = os.path.abspath(options.json_dir)
+        base_dir = os.path.commonpath([abs_json_file, abs_base_dir])
+
+        json_file = validate_file_path(abs_json_file, base_dir)
+        result["file"] = json_file
+        logging.info(f"Processing file: {json_file}")
+
+        # Load and process the song data
+        cache = None
+        if caches is not None:
+            directory = os.path.dirname(json_file)
+            if directory not in caches:
+                caches[directory] = SongCache(directory)
+            cache = caches[directory]
+        song_data = load_song_data(json_file, cache=cache)
+
+        # Create a unique output folder for the song
+        base = os.path.splitext(os.path.basename(json_file))[0]
+        date = datetime.datetime.now().strftime("%Y%m%d")
+        song_output_dir = os.path.join(options.output_dir, f"{base}_{date}")
+
+        # Check if the directory already exists
+        if os.path.exists(song_output_dir) and not getattr(options, "overwrite", False):
+            timestamp = datetime.datetime.now().strftime("%H%M%S")
+            try:
+                user_input = input(f"Directory '{song_output_dir}' already exists. Overwrite? (y/n): ")
+            except EOFError:
+                # No one to ask (e.g. an isolated worker): keep the existing folder
+                user_input = "n"
+            if user_input.lower() != 'y':
+                song_output_dir = os.path.join(options.output_dir, f"{base}_{date}_{timestamp}")
+
+        ensure_directory_exists(song_output_dir)
+        result["output_dir"] = song_output_dir
+
+        # Generate and save files in the song-specific folder; the timed formats share one timeline
+        timeline = build_timeline(song_data)
+        outputs = {
+            "pdf": (generate_pdf, f"{base}_Guitar_Progression.pdf", {}),
+            "midi": (generate_midi, f"{base}_Chorus.mid", {"timeline": timeline}),
+            "abc": (generate_abc, f"{base}.abc", {"timeline": timeline}),
+            "musicxml": (generate_musicxml, f"{base}_Full_Score.musicxml", {"timeline": timeline}),
+        }
+        for fmt, (generate, file_name, extra) in outputs.items():
+            output_path = validate_file_path(os.path.join(song_output_dir, file_name), song_output_dir)
+            result["outputs"][fmt] = output_path if generate(song_data, output_path=output_path, **extra) else None
+
+        result["ok"] = all(result["outputs"].values())
+        logging.info(f"Files for '{base}' saved in {song_output_dir}")
+    except MemoryError:
+        if supervised:
+            raise
+        result["limit"] = "memory"
+        result["error"] = "ran out of memory"
+        logging.error(f"Error processing {json_file}: {result['error']}")
+    except Exception as e:
+        result["error"] = str(e)
+        logging.error(f"Error processing {json_file}: {e}")
+    return result
+
+def close_caches(caches):
+    """Save and close every SongCache in caches."""
+    for cache in (caches or {}).values():
+        logging.debug(f"Parse cache {cache.path}: {cache.hits} hits, {cache.misses} misses")
+        cache.save()
+        cache.close()
+
+def render_in_worker(json_file, options, caches):
+    """process_song as run by a supervised worker; caches lives as long as the worker."""
+    return process_song(json_file, options, caches if getattr(options, "parse_cache", True) else None, supervised=True)
+
+def run_isolated(json_files, options):
+    """
+    Process each file in a supervised worker with the --timeout and --max-rss-mb budgets.
+    A song that overruns is recorded with its "limit" and the worker is replaced.
+    """
+    limit_errors = {
+        "timeout": f"timed out after {options.timeout:g}s",
+        "memory": f"exceeded the {options.max_rss_mb} MB memory budget",
+        "crashed": "worker process exited unexpectedly",
+    }
+    results = []
+    with Supervisor(render_in_worker, args=(options,), finish=close_caches,
+                    timeout=options.timeout, max_rss_mb=options.max_rss_mb) as supervisor:
+        for json_file in json_files:
+            result, limit = supervisor.run(json_file)
+            if result is None:
+                result = {"file": json_file, "ok": False, "output_dir": None, "outputs": {}, "error": None}
+            result["limit"] = limit
+            if limit is not None:
+                result["ok"] = False
+                result["error"] = limit_errors[limit]
+                logging.error(f"Error processing {json_file}: {result['error']}")
+            results.append(result)
+    over_budget = [result for result in results if result["limit"] is not None]
+    logging.info(f"Isolated run: {len(results) - len(over_budget)} of {len(results)} songs within budget, "
+                 f"{supervisor.recycled} worker restarts")
+    for result in over_budget:
+        logging.warning(f"  {result['file']}: {result['error']}")
+    return results
+
+def run_batch(json_files, options=None):
+    """
+    Process JSON files and return one result dict per file.
+    options is a namespace as produced by build_parser(); parser defaults are used when omitted.
+    Songs are rendered in-process unless options.isolate is set.
+    """
+    if options is None:
+        options = build_parser().parse_args([])
+    ensure_directory_exists(options.output_dir)
+    if getattr(options, "isolate", False):
+        return run_isolated(json_files, options)
+    caches = {} if getattr(options, "parse_cache", True) else None
+    try:
+        return [process_song(json_file, options, caches) for json_file in json_files]
+    finally:
+        close_caches(caches)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "import":
+        return song_importer.main(argv[1:])
+    args = build_parser().parse_args(argv)
 
     configure_logging(args.verbosity)
     ensure_directory_exists(args.json_dir)
@@ -224,71 +685,20 @@ if __name__ == "__main__":
     logging.debug(f"JSON directory: {args.json_dir}")
 
     if not args.json_files:
-        logging.info(f"Looking in {args.json_dir}")
-        json_files = [f for f in os.listdir(args.json_dir) if f.endswith(".json")]
+        json_files = select_json_files(args.json_dir)
+        if json_files is None:
+            return 1
         if not json_files:
-            logging.error("No JSON files found.")
-            exit(1)
-        print("Available JSON files:")
-        for file in json_files:
-            print(f" - {file}")
-        print("Options:")
-        print("  [1] Enter file names (comma-separated)")
-        print("  [2] Process ALL files in the directory")
-        choice = input("Choose an option [1/2]: ").strip()
-        if choice == '2':
-            confirm = input(f"Are you sure you want to process ALL {len(json_files)} files in '{args.json_dir}'? (y/n): ").strip().lower()
-            if confirm == 'y':
-                args.json_files = [os.path.join(args.json_dir, f) for f in json_files]
-            else:
-                print("Aborted.")
-                exit(0)
-        else:
-            selected = input("Enter JSON files (comma-separated): ")
-            args.json_files = [
-                os.path.abspath(f.strip()) if os.path.isabs(f.strip()) else os.path.normpath(os.path.join(args.json_dir, f.strip()))
-                for f in selected.split(",")
-            ]
-
-    # Process each JSON file
-    for json_file in args.json_files:
-        try:
-            # Ensure both paths are absolute before comparison
-            abs_json_file = os.path.abspath(json_file)
-            abs_base_dir = os.path.abspath(args.json_dir)
-            base_dir = os.path.commonpath([abs_json_file, abs_base_dir])
-
-            json_file = validate_file_path(abs_json_file, base_dir)
-            logging.info(f"Processing file: {json_file}")
+            return 0
+        args.json_files = json_files
 
-            # Load and process the song data
-            song_data = load_song_data(json_file)
-
-            # Create a unique output folder for the song
-            base = os.path.splitext(os.path.basename(json_file))[0]
-            date = datetime.datetime.now().strftime("%Y%m%d")
-            song_output_dir = os.path.join(args.output_dir, f"{base}_{date}")
-
-            # Check if the directory already exists
-            if os.path.exists(song_output_dir):
-                timestamp = datetime.datetime.now().strftime("%H%M%S")
-                user_input = input(f"Directory '{song_output_dir}' already exists. Overwrite? (y/n): ")
-                if user_input.lower() != 'y':
-                    song_output_dir = os.path.join(args.output_dir, f"{base}_{date}_{timestamp}")
-
-            ensure_directory_exists(song_output_dir)
-
-            # Generate and save files in the song-specific folder
-            pdf_output = validate_file_path(os.path.join(song_output_dir, f"{base}_Guitar_Progression.pdf"), song_output_dir)
-            midi_output = validate_file_path(os.path.join(song_output_dir, f"{base}_Chorus.mid"), song_output_dir)
-            abc_output = validate_file_path(os.path.join(song_output_dir, f"{base}.abc"), song_output_dir)
-            xml_output = validate_file_path(os.path.join(song_output_dir, f"{base}_Full_Score.musicxml"), song_output_dir)
-
-            generate_pdf(song_data, output_path=pdf_output)
-            generate_midi(song_data, output_path=midi_output)
-            generate_abc(song_data, output_path=abc_output)
-            generate_musicxml(song_data, output_path=xml_output)
+    try:
+        run_batch(args.json_files, args)
+    except ValueError as e:
+        # e.g. a --max-rss-mb budget below what a worker needs to start
+        logging.error(e)
+        return 1
+    return 0
 
-            logging.info(f"Files for '{base}' saved in {song_output_dir}")
-        except Exception as e:
-            logging.error(f"Error processing {json_file}: {e}")
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+# Song builder: turn compact song templates into song JSON files consumed
+# by music_dox_generator.py.
+#
+# A template file holds shared "defaults", reusable "blocks" (progression,
+# strumming pattern, chord charts) and either a "songs" list or the fields
+# of a single song. Sections point at a block with "use". Each written song
+# keeps those references and stores the blocks it uses once; expand_song()
+# resolves them when the song is rendered, so a chorus is not pasted into
+# every section of every file.
+
+
+import json
+import argparse
+import os
+import logging
+from functools import lru_cache
+from logging_setup import configure_logging
+
+# Chord voicings: name -> (display name, frets from low E to high e).
+# "x" is a muted string, digits are fret numbers.
+CHORD_SHAPES = {
+    "A": ("A Major", "x02220"),
+    "Am": ("Am", "x02210"),
+    "B": ("B Major", "x24442"),
+    "Bb": ("Bb Major", "113331"),
+    "Bm": ("Bm", "x24432"),
+    "C": ("C Major", "x32010"),
+    "D": ("D Major", "xx0232"),
+    "Dm": ("Dm", "xx0231"),
+    "E": ("E Major", "022100"),
+    "Em": ("Em", "022000"),
+    "F": ("F Major", "133211"),
+    "G": ("G Major", "320033"),
+}
+
+# Diagram rows are printed from the high e string down to the low E string
+STRING_NAMES = ("e", "B", "G", "D", "A", "E")
+
+DEFAULT_SONG_FIELDS = {
+    "composer": "Stolen Thunda",
+    "tempo": 120,
+    "key": "C",
+    "meter": "4/4",
+    "unit_note_length": "1/8",
+    "midi_duration": 4,
+    "midi_volume": 80,
+}
+
+# Chord library
+@lru_cache(maxsize=None)
+def chord_voicing(name):
+    """Return the fret tuple for a chord, low E first (None for a muted string)."""
+    if name not in CHORD_SHAPES:
+        raise KeyError(f"No chord shape defined for '{name}'")
+    frets = CHORD_SHAPES[name][1]
+    return tuple(None if f == "x" else int(f) for f in frets)
+
+@lru_cache(maxsize=None)
+def chord_diagram(name):
+    """Return the ASCII chord chart for a chord, built once per chord name."""
+    frets = reversed(chord_voicing(name))
+    display_name = CHORD_SHAPES[name][0]
+    lines = [
+        f"{string}|-{'-' if fret is None else fret}-"
+        for string, fret in zip(STRING_NAMES, frets)
+    ]
+    return f"{display_name} Chord\n" + "\n".join(lines) + "\n"
+
+def chord_diagrams(progression):
+    """Concatenate the charts for each distinct chord of a progression, in order of first use."""
+    return "".join(chord_diagram(name) for name in dict.fromkeys(progression))
+
+# Template expansion
+def resolve_block(block_name, blocks):
+    if block_name not in blocks:
+        raise KeyError(f"Unknown block '{block_name}'")
+    return blocks[block_name]
+
+def render_block_header(block, block_name):
+    label = block.get("label", block_name.capitalize())
+    progression = block.get("progression") or []
+    content = f"{label} Progression: {' - '.join(progression)}\n"
+    for pattern in block.get("strumming_pattern") or []:
+        content += f"Strumming Pattern: {pattern}\n"
+    return content
+
+def render_section(section, blocks, block_cache):
+    """Expand a template section into a song section, merging in its block."""
+    block_name = section.get("use")
+    block = resolve_block(block_name, blocks) if block_name else {}
+    if block_name and block_name not in block_cache:
+        # Header and chord charts are identical for every use of a block
+        block_cache[block_name] = (
+            render_block_header(block, block_name),
+            chord_diagrams(block.get("progression") or []) if block.get("diagrams") else "",
+        )
+    header, diagrams = block_cache.get(block_name, ("", ""))
+    lyrics = section.get("lyrics") or []
+    content = header + "\n" + "".join(f"{line}\n" for line in lyrics)
+    if diagrams:
+        content += "\n" + diagrams
+    return {
+        "title": section.get("title", block.get("label", "")),
+        "content": content,
+        "progression": list(section.get("progression") or block.get("progression") or []),
+        "lyrics": list(lyrics),
+        "strumming_pattern": list(section.get("strumming_pattern") or block.get("strumming_pattern") or []),
+    }
+
+def render_song(song, blocks, defaults=None):
+    """
+    Build the JSON for one song template. Sections keep their "use" references and
+    the blocks they use are stored once under "blocks"; see expand_song().
+    """
+    song_data = dict(DEFAULT_SONG_FIELDS)
+    song_data.update(defaults or {})
+    song_data.update({k: v for k, v in song.items() if k not in ("sections", "file")})
+    song_data.setdefault("title", "Untitled")
+    sections = [dict(section) for section in song.get("sections") or []]
+    song_data["blocks"] = {
+        section["use"]: resolve_block(section["use"], blocks) for section in sections if section.get("use")
+    }
+    song_data["sections"] = sections
+    # Section chords and lyrics are filled in by expand_song()
+    song_data["abc_notation"] = {
+        "reference_number": song_data.get("reference_number", 1),
+        "title": song_data["title"],
+        "composer": song_data["composer"],
+        "meter": song_data["meter"],
+        "unit_note_length": song_data["unit_note_length"],
+        "tempo": f"1/4={song_data['tempo']}",
+        "key": song_data["key"],
+    }
+    return song_data
+
+def expand_song(song_data):
+    """
+    Return song_data with the block references of its sections resolved into full sections,
+    the form music_dox_generator.py renders. Songs without "blocks" are returned unchanged.
+    """
+    if "blocks" not in song_data:
+        return song_data
+    song_data = dict(song_data)
+    blocks = song_data.pop("blocks") or {}
+    block_cache = {}
+    song_data["sections"] = [
+        render_section(section, blocks, block_cache)
+        for section in song_data.get("sections") or []
+        if section is not None
+    ]
+    if "midi_progression" not in song_data:
+        song_data["midi_progression"] = [c for s in song_data["sections"] for c in s["progression"]]
+    abc_notation = song_data.get("abc_notation")
+    if abc_notation is not None and "sections" not in abc_notation:
+        song_data["abc_notation"] = dict(abc_notation, sections=[
+            {"title": s["title"], "chords": s["progression"], "lyrics": s["lyrics"]}
+            for s in song_data["sections"]
+        ])
+    return song_data
+
+def song_file_name(song):
+    if song.get("file"):
+        return song["file"]
+    title = song.get("title") or "Untitled"
+    safe = "".join(c for c in title if c.isalnum() or c in " _-").strip()
+    return safe.replace(" ", "_") + ".json"
+
+def load_template(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def template_songs(template):
+    """Return the song templates of a template file, which may hold a single song."""
+    songs = template.get("songs")
+    if songs is None:
+        songs = [{k: v for k, v in template.items() if k not in ("blocks", "defaults")}]
+    return songs
+
+def render_template(template):
+    """Yield (file name, song data) for every song in a template."""
+    blocks = template.get("blocks") or {}
+    defaults = template.get("defaults") or {}
+    for song in template_songs(template):
+        yield song_file_name(song), render_song(song, blocks, defaults)
+
+def build_songs(template_paths, output_dir):
+    """
+    Render every template into output_dir and return the written paths.
+    A song with an unknown block or chord is logged and skipped.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for template_path in template_paths:
+        template = load_template(template_path)
+        blocks = template.get("blocks") or {}
+        defaults = template.get("defaults") or {}
+        for song in template_songs(template):
+            file_name = song_file_name(song)
+            try:
+                song_data = render_song(song, blocks, defaults)
+                # Resolve once here so a bad reference is reported now rather than at render time
+                expand_song(song_data)
+            except KeyError as e:
+                logging.error(f"Skipping {file_name} from {template_path}: {e.args[0]}")
+                continue
+            out_path = os.path.join(output_dir, file_name)
+            with open(out_path, "w", encoding="utf-8") as f:
+                json.dump(song_data, f, indent=4, ensure_ascii=False)
+            logging.info(f"Song JSON saved to {out_path}")
+            written.append(out_path)
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build song JSON files from compact templates.")
+    parser.add_argument("templates", nargs="+", help="Paths to template JSON files.")
+    parser.add_argument("--output_dir", default="./json", help="Directory to save song JSON files.")
+    parser.add_argument("--verbosity", choices=["ERROR", "INFO", "DEBUG"], default="INFO")
+    args = parser.parse_args()
+
+    configure_logging(args.verbosity)
+    build_songs(args.templates, args.output_dir)
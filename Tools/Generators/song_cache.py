@@ -0,0 +1,163 @@
+# Parsed-song cache: keeps decoded song JSON in one memory-mapped file per
+# directory so unchanged songs load without JSON parsing.
+#
+# File layout: header (magic, index offset, index length), marshal-encoded
+# song records, then a marshal-encoded index mapping each JSON file name to
+# (mtime_ns, size, record offset, record length, last used).
+
+
+import marshal
+import mmap
+import os
+import struct
+import time
+import logging
+
+CACHE_FILE_NAME = ".parsed_songs.cache"
+CACHE_MAGIC = b"SONGC001"
+HEADER = struct.Struct("<8sQQ")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+class SongCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.path = os.path.join(directory, CACHE_FILE_NAME)
+        self.max_bytes = max_bytes
+        self.index = {}
+        self.pending = {}
+        self.dirty = False
+        self.touched = False
+        self.hits = 0
+        self.misses = 0
+        self._file = None
+        self._map = None
+        self._open()
+
+    def _open(self):
+        try:
+            self._file = open(self.path, "rb")
+            if os.fstat(self._file.fileno()).st_size < HEADER.size:
+                raise ValueError("truncated header")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, index_offset, index_length = HEADER.unpack_from(self._map, 0)
+            if magic != CACHE_MAGIC:
+                raise ValueError("unknown format")
+            self.index = marshal.loads(self._map[index_offset:index_offset + index_length])
+        except FileNotFoundError:
+            self.close()
+        except (OSError, ValueError, EOFError, TypeError, struct.error) as e:
+            logging.debug(f"Ignoring unreadable parse cache {self.path}: {e}")
+            self.close()
+            self.index = {}
+            self.dirty = True
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read_record(self, entry):
+        offset, length = entry[2], entry[3]
+        return self._map[offset:offset + length]
+
+    def load(self, file_path, loader):
+        """Return the parsed song for file_path, calling loader(file_path) only on a miss."""
+        stat = os.stat(file_path)
+        key = os.path.basename(file_path)
+        if key in self.pending:
+            meta, blob = self.pending[key]
+            if meta[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.hits += 1
+                return marshal.loads(blob)
+        entry = self.index.get(key)
+        if entry is not None:
+            if entry[:2] == (stat.st_mtime_ns, stat.st_size) and self._map is not None:
+                try:
+                    song_data = marshal.loads(self._read_record(entry))
+                    self.index[key] = entry[:4] + (time.time_ns(),)
+                    self.touched = True
+                    self.hits += 1
+                    return song_data
+                except (ValueError, EOFError, TypeError) as e:
+                    logging.debug(f"Dropping corrupt cache entry for {key}: {e}")
+            # Stale or unreadable entry
+            del self.index[key]
+            self.dirty = True
+        self.misses += 1
+        song_data = loader(file_path)
+        try:
+            blob = marshal.dumps(song_data)
+        except ValueError:
+            return song_data
+        self.pending[key] = ((stat.st_mtime_ns, stat.st_size, 0, len(blob), time.time_ns()), blob)
+        self.dirty = True
+        return song_data
+
+    def _rewrite_index(self):
+        """Write just the index in place after the records, when only last-used times have changed."""
+        self.close()
+        try:
+            with open(self.path, "r+b") as f:
+                index_offset = HEADER.unpack(f.read(HEADER.size))[1]
+                index_blob = marshal.dumps(self.index)
+                f.seek(index_offset)
+                f.write(index_blob)
+                f.truncate()
+                f.seek(0)
+                f.write(HEADER.pack(CACHE_MAGIC, index_offset, len(index_blob)))
+        except (OSError, struct.error) as e:
+            logging.warning(f"Could not update parse cache {self.path}: {e}")
+        self.touched = False
+        self._open()
+
+    def save(self):
+        """Rewrite the cache file, dropping entries for deleted files and evicting the least recently used past max_bytes."""
+        if not self.dirty:
+            if self.touched:
+                self._rewrite_index()
+            return
+        records = {}
+        if self._map is not None:
+            for key, entry in self.index.items():
+                records[key] = (entry, self._read_record(entry))
+        for key, (entry, blob) in self.pending.items():
+            records[key] = (entry, blob)
+        self.close()
+        kept = []
+        total = 0
+        for key, (entry, blob) in sorted(records.items(), key=lambda item: item[1][0][4], reverse=True):
+            if not os.path.exists(os.path.join(self.directory, key)):
+                continue
+            if total + len(blob) > self.max_bytes:
+                logging.debug(f"Evicting {key} from parse cache")
+                continue
+            kept.append((key, entry, blob))
+            total += len(blob)
+        index = {}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(b"\0" * HEADER.size)
+                offset = HEADER.size
+                for key, entry, blob in kept:
+                    f.write(blob)
+                    index[key] = (entry[0], entry[1], offset, len(blob), entry[4])
+                    offset += len(blob)
+                index_blob = marshal.dumps(index)
+                f.write(index_blob)
+                f.seek(0)
+                f.write(HEADER.pack(CACHE_MAGIC, offset, len(index_blob)))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Could not write parse cache {self.path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.index = index
+        self.pending = {}
+        self.dirty = False
+        self.touched = False
+        self._open()
@@ -0,0 +1,777 @@
+# Song importer: bulk-convert existing MusicXML and ABC files into the song
+# JSON format read by music_dox_generator.py.
+#
+# MusicXML is stream-parsed with iterparse and every measure is cleared as
+# soon as it has been read, so memory stays flat on long scores; ABC is read
+# line by line. Files are converted in parallel across a process pool.
+
+
+import json
+import argparse
+import os
+import re
+import zipfile
+import logging
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from fractions import Fraction
+from itertools import repeat
+from logging_setup import configure_logging
+
+IMPORT_EXTENSIONS = (".musicxml", ".xml", ".mxl", ".abc")
+
+DEFAULT_SONG_FIELDS = {
+    "title": "Untitled",
+    "composer": "Unknown",
+    "tempo": 120,
+    "key": "C",
+    "meter": "4/4",
+    "unit_note_length": "1/8",
+    "midi_volume": 80,
+}
+
+NOTE_STEPS = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+# Chord suffix -> intervals above the root
+CHORD_QUALITIES = {
+    "": (0, 4, 7),
+    "m": (0, 3, 7),
+    "dim": (0, 3, 6),
+    "aug": (0, 4, 8),
+    "sus2": (0, 2, 7),
+    "sus4": (0, 5, 7),
+    "5": (0, 7),
+    "6": (0, 4, 7, 9),
+    "m6": (0, 3, 7, 9),
+    "7": (0, 4, 7, 10),
+    "maj7": (0, 4, 7, 11),
+    "m7": (0, 3, 7, 10),
+    "m7b5": (0, 3, 6, 10),
+    "dim7": (0, 3, 6, 9),
+}
+QUALITY_ALIASES = {"maj": "", "M": "", "min": "m", "-": "m", "+": "aug", "sus": "sus4", "ø": "m7b5", "°": "dim"}
+
+# MusicXML <kind> values -> chord suffix
+HARMONY_KINDS = {
+    "major": "", "minor": "m", "augmented": "aug", "diminished": "dim",
+    "dominant": "7", "major-seventh": "maj7", "minor-seventh": "m7",
+    "diminished-seventh": "dim7", "half-diminished": "m7b5",
+    "suspended-second": "sus2", "suspended-fourth": "sus4", "power": "5",
+    "major-sixth": "6", "minor-sixth": "m6",
+}
+
+# Chord suffix -> MusicXML <kind>, the inverse of HARMONY_KINDS
+SUFFIX_KINDS = {suffix: kind for kind, suffix in HARMONY_KINDS.items()}
+
+MAJOR_KEYS = ["Cb", "Gb", "Db", "Ab", "Eb", "Bb", "F", "C", "G", "D", "A", "E", "B", "F#", "C#"]
+MINOR_KEYS = ["Abm", "Ebm", "Bbm", "Fm", "Cm", "Gm", "Dm", "Am", "Em", "Bm", "F#m", "C#m", "G#m", "D#m", "A#m"]
+
+CHORD_NAME_RE = re.compile(r"^([A-G])([#b]?)((?:maj|min|dim|aug|sus|add|m|M|[0-9#b+\-()°ø])*)(?:/([A-G][#b]?))?$")
+ABC_TOKEN_RE = re.compile(
+    r'"[^"]*"|![^!]*!|\+[^+]*\+|\{[^}]*\}|\[\d+|\[[A-Za-z]:[^\]]*\]|\[[^\][|]*\][\d/]*'
+    r'|\|:|:\|\d*|::|\|\]|\|\||\|\d*|\(\d|[<>]+|[_^=]*[A-Ga-gxzXZ][,\']*[\d/]*'
+)
+ABC_NOTE_RE = re.compile(r"[_^=]*([A-Ga-gxzXZ])[,']*(\d*)(/*)(\d*)")
+# Tuplet (p -> the time of q notes, for simple meters
+ABC_TUPLETS = {2: 3, 3: 2, 4: 3, 5: 2, 6: 2, 7: 2, 8: 3, 9: 2}
+
+# Chord naming
+def spell_note(step, alter):
+    return step + ("#" * alter if alter > 0 else "b" * -alter)
+
+def split_chord_name(name):
+    """Return (root, suffix, bass) for a chord name with quality aliases normalised, or None."""
+    match = CHORD_NAME_RE.match(name) if isinstance(name, str) else None
+    if not match:
+        return None
+    step, accidental, suffix, bass = match.groups()
+    return step + accidental, QUALITY_ALIASES.get(suffix, suffix), bass
+
+def chord_name_to_midi(name):
+    """Return a close-position voicing for a chord name, rooted between A3 and G#4."""
+    parts = split_chord_name(name)
+    if parts is None:
+        return []
+    root_name, suffix, _ = parts
+    root_pc = (NOTE_STEPS[root_name[0]] + {"#": 1, "b": -1}.get(root_name[1:], 0)) % 12
+    root = 57 + (root_pc - 9) % 12
+    intervals = CHORD_QUALITIES.get(suffix)
+    if intervals is None:
+        minor = suffix.startswith("m") and not suffix.startswith("maj")
+        intervals = CHORD_QUALITIES["m" if minor else ""]
+    return [root + i for i in intervals]
+
+def name_chord(notes):
+    """Name a group of (midi, step, alter) notes, trying each note from the bass up as the root."""
+    notes = sorted(notes)
+    pitch_classes = {midi % 12 for midi, _, _ in notes}
+    for midi, step, alter in notes:
+        intervals = tuple(sorted((pc - midi) % 12 for pc in pitch_classes))
+        for suffix, quality in CHORD_QUALITIES.items():
+            if intervals == quality:
+                return spell_note(step, alter) + suffix
+    return "+".join(dict.fromkeys(spell_note(step, alter) for _, step, alter in notes))
+
+def midi_duration_for_meter(meter_val):
+    try:
+        beats, beat_type = (int(part) for part in meter_val.split("/"))
+    except ValueError:
+        return 4
+    quarters = beats * 4 / beat_type
+    return int(quarters) if quarters == int(quarters) else quarters
+
+def quarter_number(quarters):
+    """Return a length in quarter notes as an int when it is whole, else a float, for JSON."""
+    return int(quarters) if quarters == int(quarters) else float(quarters)
+
+# Song assembly
+def build_song(meta, sections, voicings):
+    """
+    Assemble the song JSON structure from parsed metadata and (title, progression, lyrics, durations)
+    sections; durations are each chord's length in quarter notes.
+    """
+    song = dict(DEFAULT_SONG_FIELDS)
+    song.update({k: v for k, v in meta.items() if v is not None})
+    song["midi_duration"] = midi_duration_for_meter(song["meter"])
+    song["midi_chords"] = {}
+    song["sections"] = []
+    for title, progression, lyrics, durations in sections:
+        for chord_name in progression:
+            if chord_name not in song["midi_chords"]:
+                song["midi_chords"][chord_name] = voicings.get(chord_name) or chord_name_to_midi(chord_name)
+        song["sections"].append({
+            "title": title,
+            "progression": progression,
+            "durations": [quarter_number(quarters) for quarters in durations],
+            "lyrics": lyrics,
+            "strumming_pattern": [],
+        })
+    song["abc_notation"] = {
+        "reference_number": song.pop("reference_number", 1),
+        "title": song["title"],
+        "composer": song["composer"],
+        "meter": song["meter"],
+        "unit_note_length": song["unit_note_length"],
+        "tempo": song.pop("abc_tempo", f"1/4={song['tempo']}"),
+        "key": song["key"],
+        "sections": [
+            {"title": s["title"], "chords": s["progression"], "lyrics": s["lyrics"]}
+            for s in song["sections"]
+        ],
+    }
+    return song
+
+def expand_passes(titles, passes, section_count):
+    """Yield a title for each pass of a repeated block."""
+    for pass_num in range(passes):
+        if pass_num < len(titles) and titles[pass_num]:
+            yield titles[pass_num]
+        elif titles and titles[-1]:
+            yield titles[-1]
+        else:
+            yield f"Section {section_count + pass_num + 1}"
+
+# MusicXML
+def local_tag(elem):
+    return elem.tag.rpartition("}")[2]
+
+def open_musicxml(file_path):
+    """Return a binary stream over the score document, unpacking compressed .mxl files."""
+    if not file_path.lower().endswith(".mxl"):
+        return open(file_path, "rb")
+    archive = zipfile.ZipFile(file_path)
+    rootfile = None
+    if "META-INF/container.xml" in archive.namelist():
+        container = ET.fromstring(archive.read("META-INF/container.xml"))
+        for elem in container.iter():
+            if local_tag(elem) == "rootfile":
+                rootfile = elem.get("full-path")
+                break
+    if rootfile is None:
+        rootfile = next(n for n in archive.namelist() if n.endswith(".xml") and not n.startswith("META-INF/"))
+    return archive.open(rootfile)
+
+def element_offset(elem, divisions):
+    """Return the <offset> of a <direction> or <harmony> in quarter notes, 0 when it has none."""
+    offset = elem.find("{*}offset")
+    return Fraction(int(float(offset.text)), divisions) if offset is not None and offset.text else 0
+
+def read_measure(elem, meta, state):
+    """
+    Extract chord events, lyrics and repeat structure from one <measure>, filling meta on first sight.
+    Each event is a chord with its own lyrics, its offset in quarter notes and its duration, which
+    runs to the next event or the end of the measure. A <harmony> symbol
+    starts an event and names it; in measures without symbols, every sounding note group of two
+    or more pitch classes is an event. Notes that do not start an event (melody under a symbol,
+    tied continuations) add their lyrics to the event before them, recorded with a None chord
+    when that event is in an earlier measure. Rehearsal marks are kept with their offsets in
+    "labels". state carries <divisions> from measure to measure.
+    """
+    measure = {
+        "events": [], "voicings": {}, "labels": [],
+        "repeat_start": False, "repeat_times": 0, "ending": None, "ending_stop": False,
+    }
+    has_harmony = any(local_tag(child) == "harmony" for child in elem)
+    pending = None
+    pending_offset = 0
+    current = None
+    event_tones = None
+    position = 0
+    measure_end = 0
+    for child in elem:
+        tag = local_tag(child)
+        if tag == "attributes":
+            for sub in child.iter():
+                sub_tag = local_tag(sub)
+                if sub_tag == "divisions" and sub.text:
+                    state["divisions"] = int(float(sub.text))
+                elif sub_tag == "fifths" and meta.get("key") is None:
+                    mode = child.find(".//{*}mode")
+                    keys = MINOR_KEYS if mode is not None and mode.text == "minor" else MAJOR_KEYS
+                    meta["key"] = keys[max(-7, min(7, int(sub.text))) + 7]
+                elif sub_tag == "time" and meta.get("meter") is None:
+                    beats = sub.find("{*}beats")
+                    beat_type = sub.find("{*}beat-type")
+                    if beats is not None and beat_type is not None:
+                        meta["meter"] = f"{beats.text}/{beat_type.text}"
+        elif tag in ("direction", "sound"):
+            for sub in child.iter():
+                sub_tag = local_tag(sub)
+                if sub_tag == "sound" and sub.get("tempo") and meta.get("tempo") is None:
+                    meta["tempo"] = round(float(sub.get("tempo")))
+                elif sub_tag == "per-minute" and meta.get("tempo") is None and sub.text:
+                    meta["tempo"] = round(float(sub.text))
+                elif sub_tag == "rehearsal" and sub.text:
+                    measure["labels"].append((position + element_offset(child, state["divisions"]), sub.text.strip()))
+        elif tag == "harmony":
+            root_step = child.find("{*}root/{*}root-step")
+            if root_step is not None:
+                root_alter = child.find("{*}root/{*}root-alter")
+                kind = child.find("{*}kind")
+                alter = int(float(root_alter.text)) if root_alter is not None else 0
+                suffix = HARMONY_KINDS.get(kind.text if kind is not None else "major", "")
+                pending = spell_note(root_step.text, alter) + suffix
+                bass_step = child.find("{*}bass/{*}bass-step")
+                if bass_step is not None:
+                    bass_alter = child.find("{*}bass/{*}bass-alter")
+                    pending += "/" + spell_note(bass_step.text, int(float(bass_alter.text)) if bass_alter is not None else 0)
+                pending_offset = position + element_offset(child, state["divisions"])
+        elif tag in ("backup", "forward"):
+            duration_elem = child.find("{*}duration")
+            if duration_elem is not None:
+                step = Fraction(int(float(duration_elem.text)), state["divisions"])
+                position += step if tag == "forward" else -step
+                measure_end = max(measure_end, position)
+        elif tag == "note":
+            is_chord_tone = child.find("{*}chord") is not None
+            tied_over = any(t.get("type") == "stop" for t in child.findall("{*}tie"))
+            step = child.find("{*}pitch/{*}step")
+            if step is not None:
+                alter_elem = child.find("{*}pitch/{*}alter")
+                octave = int(child.find("{*}pitch/{*}octave").text)
+                alter = int(float(alter_elem.text)) if alter_elem is not None else 0
+                tone = ((octave + 1) * 12 + NOTE_STEPS[step.text] + alter, step.text, alter)
+            else:
+                tone = None
+            if is_chord_tone:
+                if event_tones is not None and tone is not None:
+                    event_tones.append(tone)
+                continue
+            event_tones = None
+            note_offset = position
+            duration_elem = child.find("{*}duration")
+            if duration_elem is not None and child.find("{*}grace") is None:
+                position += Fraction(int(float(duration_elem.text)), state["divisions"])
+                measure_end = max(measure_end, position)
+            if pending is not None:
+                # The first note under a chord symbol starts its event
+                current = {"chord": pending, "tones": [], "lyrics": {}, "offset": pending_offset}
+                measure["events"].append(current)
+                pending = None
+                if tone is not None and not tied_over:
+                    event_tones = current["tones"]
+                    event_tones.append(tone)
+            elif not has_harmony and tone is not None and not tied_over:
+                current = {"chord": None, "tones": [tone], "lyrics": {}, "offset": note_offset}
+                measure["events"].append(current)
+                event_tones = current["tones"]
+            elif current is None:
+                current = {"chord": None, "tones": [], "lyrics": {}, "offset": note_offset}
+                measure["events"].append(current)
+            for lyric in child.findall("{*}lyric"):
+                text = lyric.find("{*}text")
+                syllabic = lyric.find("{*}syllabic")
+                if text is not None and text.text:
+                    current["lyrics"].setdefault(lyric.get("number", "1"), []).append(
+                        (syllabic.text if syllabic is not None else "single", text.text))
+        elif tag == "barline":
+            repeat_elem = child.find("{*}repeat")
+            if repeat_elem is not None:
+                if repeat_elem.get("direction") == "forward":
+                    measure["repeat_start"] = True
+                else:
+                    measure["repeat_times"] = int(repeat_elem.get("times") or 2)
+            ending = child.find("{*}ending")
+            if ending is not None:
+                if ending.get("type") == "start":
+                    measure["ending"] = [int(n) for n in re.findall(r"\d+", ending.get("number", "1"))]
+                else:
+                    measure["ending_stop"] = True
+    if pending is not None:
+        measure["events"].append({"chord": pending, "tones": [], "lyrics": {}, "offset": pending_offset})
+    events = measure["events"]
+    for event, next_event in zip(events, events[1:] + [None]):
+        event["duration"] = max((next_event["offset"] if next_event else measure_end) - event["offset"], 0)
+    for event in measure["events"]:
+        notes = sorted(set(event.pop("tones")))
+        if len({n[0] % 12 for n in notes}) < 2:
+            continue
+        if event["chord"] is None:
+            event["chord"] = name_chord(notes)
+        measure["voicings"].setdefault(event["chord"], [n[0] for n in notes])
+    return measure
+
+def split_at_labels(measure):
+    """
+    Split a measure at the rehearsal marks inside it, so a section can start mid-measure.
+    Returns the pieces in order, each with the "label" it starts with (None for none).
+    Repeat and ending marks at the start stay on the first piece, the ones at the end on the last.
+    """
+    labels = {}
+    for offset, text in measure.pop("labels"):
+        labels.setdefault(max(offset, 0), text)
+    cuts = sorted(offset for offset in labels if offset > 0 and any(e["offset"] >= offset for e in measure["events"]))
+    if not cuts:
+        measure["label"] = labels.get(0)
+        return [measure]
+    pieces = []
+    for start, end in zip([0] + cuts, cuts + [None]):
+        piece = dict(measure, label=labels.get(start), repeat_start=False, repeat_times=0, ending=None, ending_stop=False)
+        piece["events"] = [e for e in measure["events"] if e["offset"] >= start and (end is None or e["offset"] < end)]
+        pieces.append(piece)
+    pieces[0].update(repeat_start=measure["repeat_start"], ending=measure["ending"])
+    pieces[-1].update(repeat_times=measure["repeat_times"], ending_stop=measure["ending_stop"])
+    return pieces
+
+def lyric_line(syllables):
+    """Join lyric syllables into words; a word that carries on into the next chord keeps a trailing hyphen."""
+    line = ""
+    joined = False
+    for syllabic, text in syllables:
+        line += text if joined or not line else f" {text}"
+        joined = syllabic in ("begin", "middle")
+    return line + "-" if joined else line
+
+def measures_to_sections(measures):
+    """
+    Group measures into (title, progression, lyrics, durations) sections, expanding repeats into one
+    section per pass. Events without a chord (tied continuations, melody) lengthen the chord before them.
+    """
+    sections = []
+
+    def emit(titles, passes, pass_measures):
+        for pass_num, title in enumerate(expand_passes(titles, passes, len(sections)), 1):
+            progression = []
+            durations = []
+            lyrics = []
+            for measure in pass_measures(pass_num):
+                for event in measure["events"]:
+                    verse = event["lyrics"].get(str(pass_num)) or (event["lyrics"].get("1") if passes == 1 else None)
+                    text = lyric_line(verse) if verse else ""
+                    if event["chord"] is not None:
+                        progression.append(event["chord"])
+                        durations.append(event["duration"])
+                        lyrics.append(text)
+                        continue
+                    if durations:
+                        durations[-1] += event["duration"]
+                    if text and lyrics:
+                        lyrics[-1] = f"{lyrics[-1]} {text}".strip()
+            while lyrics and not lyrics[-1]:
+                lyrics.pop()
+            if progression or lyrics:
+                sections.append((title, progression, lyrics, durations))
+
+    i = 0
+    while i < len(measures):
+        label = measures[i]["label"]
+        titles = label.split(" / ") if label else []
+        if measures[i]["repeat_start"]:
+            body = []
+            while i < len(measures) and measures[i]["ending"] is None:
+                body.append(measures[i])
+                i += 1
+                if body[-1]["repeat_times"]:
+                    break
+            endings = []
+            while i < len(measures) and measures[i]["ending"] is not None:
+                numbers = measures[i]["ending"]
+                ending_measures = []
+                while i < len(measures):
+                    ending_measures.append(measures[i])
+                    i += 1
+                    if ending_measures[-1]["ending_stop"] or (i < len(measures) and measures[i]["ending"] is not None):
+                        break
+                endings.append((numbers, ending_measures))
+            if endings:
+                passes = max(max(numbers) for numbers, _ in endings)
+            else:
+                passes = max(body[-1]["repeat_times"], 1)
+
+            def pass_measures(pass_num, body=body, endings=endings):
+                selected = list(body)
+                for numbers, ending_measures in endings:
+                    if pass_num in numbers:
+                        selected.extend(ending_measures)
+                return selected
+
+            emit(titles, passes, pass_measures)
+            continue
+        # Plain run, repeated from its start if it closes with a backward repeat
+        plain = [measures[i]]
+        i += 1
+        while i < len(measures) and not plain[-1]["repeat_times"] and not measures[i]["label"] and not measures[i]["repeat_start"]:
+            plain.append(measures[i])
+            i += 1
+        emit(titles, max(plain[-1]["repeat_times"], 1), lambda pass_num, plain=plain: plain)
+    return sections
+
+def parse_musicxml(file_path):
+    """Stream-parse a MusicXML score (first part only) into a list holding one song."""
+    meta = {"title": None, "composer": None, "tempo": None, "key": None, "meter": None}
+    movement_title = None
+    measures = []
+    voicings = {}
+    state = {"divisions": 1}
+    part_count = 0
+    with open_musicxml(file_path) as source:
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            tag = local_tag(elem)
+            if event == "start":
+                if tag == "part":
+                    part_count += 1
+                continue
+            if tag == "measure":
+                if part_count == 1:
+                    measure = read_measure(elem, meta, state)
+                    for chord_name, notes in measure.pop("voicings").items():
+                        voicings.setdefault(chord_name, notes)
+                    measures.extend(split_at_labels(measure))
+                elem.clear()
+            elif tag == "work-title" and elem.text:
+                meta["title"] = elem.text.strip()
+            elif tag == "movement-title" and elem.text:
+                movement_title = elem.text.strip()
+            elif tag == "creator" and elem.get("type") == "composer" and elem.text:
+                meta["composer"] = elem.text.strip()
+            elif tag in ("work", "identification", "defaults", "credit", "part-list", "part"):
+                elem.clear()
+    if meta["title"] is None:
+        meta["title"] = movement_title or os.path.splitext(os.path.basename(file_path))[0]
+    return [build_song(meta, measures_to_sections(measures), voicings)]
+
+# ABC
+def abc_note_length(note, unit, measure):
+    """Return the length of one ABC note or rest in quarter notes; Z and X rests count whole measures."""
+    match = ABC_NOTE_RE.match(note)
+    if match is None:
+        return 0
+    letter, numerator, slashes, denominator = match.groups()
+    if letter in "ZX":
+        return measure * int(numerator or 1)
+    length = Fraction(int(numerator or 1))
+    if slashes:
+        length /= int(denominator) if denominator else 2 ** len(slashes)
+    return length * unit
+
+def parse_abc_music(line, group, unit, measure):
+    """
+    Add the chords and repeat structure of one ABC music line to group["segments"].
+    Chords are [name, quarter notes] entries; the notes after a chord symbol add to its length.
+    unit is the L: note length and measure the M: measure length, both in quarter notes.
+    """
+    segments = group["segments"]
+    for token in ABC_TOKEN_RE.findall(line.split("%")[0]):
+        current = segments[-1]
+        if token[0] in "!+{" or re.match(r"\[[A-Za-z]:", token):
+            # Decorations, grace notes and inline fields take no time
+            continue
+        length = None
+        chord_name = None
+        if token.startswith('"'):
+            chord_name = token[1:-1]
+            if chord_name[:1] in "^_<>@" or not CHORD_NAME_RE.match(chord_name):
+                continue
+        elif token.startswith("[") and not token[1:2].isdigit():
+            inner, _, suffix = token[1:].partition("]")
+            if CHORD_NAME_RE.match(inner):
+                chord_name = inner
+            else:
+                # A chord of notes lasts as long as its first note
+                first = ABC_NOTE_RE.search(inner)
+                length = abc_note_length(first.group() if first else "", unit, measure)
+                length *= abc_note_length("x" + suffix, 1, measure)
+        elif token.startswith("("):
+            p = int(token[1:])
+            group["tuplet"] = [p, Fraction(ABC_TUPLETS.get(p, 2), p)]
+            continue
+        elif token[0] in "<>":
+            group["broken"] = token
+            continue
+        elif ABC_NOTE_RE.match(token):
+            length = abc_note_length(token, unit, measure)
+        if chord_name is not None:
+            target = current["endings"][-1][1] if current["endings"] else current["chords"]
+            group["last"] = [chord_name, 0]
+            target.append(group["last"])
+            continue
+        if length is not None:
+            if group.get("tuplet"):
+                length *= group["tuplet"][1]
+                group["tuplet"][0] -= 1
+                if not group["tuplet"][0]:
+                    group["tuplet"] = None
+            if group.get("broken") and group.get("previous"):
+                # a>b dots a and halves b; each extra > halves the shorter note again
+                shorter = Fraction(1, 2 ** len(group["broken"]))
+                entry, previous = group["previous"]
+                if group["broken"][0] == "<":
+                    shift = previous * (shorter - 1)
+                    length *= 2 - shorter
+                else:
+                    shift = previous * (1 - shorter)
+                    length *= shorter
+                if entry is not None:
+                    entry[1] += shift
+            group["broken"] = None
+            if group.get("last") is not None:
+                group["last"][1] += length
+            group["previous"] = (group.get("last"), length)
+            continue
+        ending_number = re.search(r"\d+$", token)
+        if token.startswith(":") or token == "::":
+            current["repeat"] = True
+            if ending_number:
+                current["endings"].append(([int(ending_number.group())], []))
+            elif not current["endings"]:
+                segments.append({"chords": [], "repeat": token == "::", "endings": []})
+        elif token in ("||", "|]") and current["endings"]:
+            segments.append({"chords": [], "repeat": False, "endings": []})
+        elif token == "|:":
+            if current["chords"] or current["endings"]:
+                segments.append({"chords": [], "repeat": True, "endings": []})
+            else:
+                current["repeat"] = True
+        elif ending_number:
+            current["endings"].append(([int(ending_number.group())], []))
+
+def abc_section(title, entries, lyrics):
+    """Return a (title, progression, lyrics, durations) section from [name, quarter notes] chord entries."""
+    return title, [name for name, _ in entries], lyrics, [quarters for _, quarters in entries]
+
+def abc_group_sections(group, section_count):
+    """Turn a parsed ABC block into (title, progression, lyrics, durations) sections."""
+    segments = [s for s in group["segments"] if s["chords"] or s["endings"]]
+    lyric_sets = [
+        [part.strip() for part in line.split("|") if part.strip()]
+        for line in group["lyric_lines"]
+    ]
+    titles = group["titles"]
+    if len(segments) == 1 and segments[0]["repeat"]:
+        segment = segments[0]
+        if segment["endings"]:
+            passes = max(max(numbers) for numbers, _ in segment["endings"])
+        else:
+            passes = max(2, len(lyric_sets), len(titles))
+        sections = []
+        for pass_num, title in enumerate(expand_passes(titles, passes, section_count), 1):
+            progression = list(segment["chords"])
+            for numbers, chords in segment["endings"]:
+                if pass_num in numbers:
+                    progression.extend(chords)
+            lyrics = lyric_sets[pass_num - 1] if pass_num <= len(lyric_sets) else []
+            sections.append(abc_section(title, progression, lyrics))
+        return sections
+    progression = []
+    for segment in segments:
+        if not segment["repeat"]:
+            progression.extend(segment["chords"])
+            continue
+        passes = max((max(numbers) for numbers, _ in segment["endings"]), default=2)
+        for pass_num in range(1, passes + 1):
+            progression.extend(segment["chords"])
+            for numbers, chords in segment["endings"]:
+                if pass_num in numbers:
+                    progression.extend(chords)
+    lyrics = [part for lyric_set in lyric_sets for part in lyric_set]
+    if not progression and not lyrics:
+        return []
+    title = " / ".join(titles) or f"Section {section_count + 1}"
+    return [abc_section(title, progression, lyrics)]
+
+def parse_abc(file_path):
+    """Read an ABC file line by line; every X: tune becomes one song."""
+    songs = []
+    tune = None
+
+    def new_group(titles):
+        return {"titles": titles, "segments": [{"chords": [], "repeat": False, "endings": []}], "lyric_lines": []}
+
+    def finish_tune():
+        if tune is None:
+            return
+        tune["sections"].extend(abc_group_sections(tune["group"], len(tune["sections"])))
+        if tune["meta"]["title"] is None:
+            tune["meta"]["title"] = os.path.splitext(os.path.basename(file_path))[0]
+        songs.append(build_song(tune["meta"], tune["sections"], {}))
+
+    def start_group(titles):
+        tune["sections"].extend(abc_group_sections(tune["group"], len(tune["sections"])))
+        tune["group"] = new_group(titles)
+
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        for raw_line in f:
+            line = raw_line.strip()
+            if not line:
+                continue
+            field_match = re.match(r"^([A-Za-z]):(.*)$", line)
+            if field_match and field_match.group(1) not in "wW":
+                field, value = field_match.group(1), field_match.group(2).strip()
+                if field == "X":
+                    finish_tune()
+                    tune = {"meta": {"title": None, "composer": None, "tempo": None, "key": None,
+                                     "meter": None, "unit_note_length": None},
+                            "sections": [], "group": new_group([]), "in_body": False}
+                    tune["meta"]["reference_number"] = int(value) if value.isdigit() else 1
+                    continue
+                if tune is None:
+                    continue
+                meta = tune["meta"]
+                if field == "T" and meta["title"] is None:
+                    meta["title"] = value
+                elif field == "C" and meta["composer"] is None:
+                    meta["composer"] = value
+                elif field == "M":
+                    meta["meter"] = {"C": "4/4", "C|": "2/2"}.get(value, value)
+                elif field == "L":
+                    meta["unit_note_length"] = value
+                elif field == "Q":
+                    meta["abc_tempo"] = value
+                    bpm = re.search(r"(\d+)\s*$", value)
+                    if bpm:
+                        meta["tempo"] = int(bpm.group(1))
+                elif field == "K":
+                    meta["key"] = value.split()[0] if value else None
+                    tune["in_body"] = True
+                elif field == "P" and tune["in_body"]:
+                    # A header P: is the play order, not a part label
+                    start_group([value])
+                continue
+            if tune is None:
+                continue
+            if line == "%%" or line.startswith("%% "):
+                # Section titles as written by generate_abc; "%%name" lines are directives
+                start_group([title.strip() for title in line[2:].split(" / ")])
+            elif line.startswith("%"):
+                continue
+            elif line.startswith("w:"):
+                tune["group"]["lyric_lines"].append(line[2:].strip())
+            elif line.startswith("W:"):
+                continue
+            else:
+                meta = tune["meta"]
+                try:
+                    unit = Fraction(meta["unit_note_length"] or "1/8") * 4
+                except (ValueError, ZeroDivisionError):
+                    unit = Fraction(1, 2)
+                measure = Fraction(midi_duration_for_meter(meta["meter"] or "4/4"))
+                parse_abc_music(line, tune["group"], unit, measure)
+    finish_tune()
+    return songs
+
+# Batch import
+def parse_file(file_path):
+    if file_path.lower().endswith(".abc"):
+        return parse_abc(file_path)
+    return parse_musicxml(file_path)
+
+def import_file(file_path, output_dir, name=None):
+    """Convert one file and write one JSON per song. Runs inside a worker process."""
+    result = {"file": file_path, "outputs": [], "error": None}
+    try:
+        songs = parse_file(file_path)
+        base = name or os.path.splitext(os.path.basename(file_path))[0]
+        for idx, song in enumerate(songs, 1):
+            song_name = base if len(songs) == 1 else f"{base}_{idx}"
+            out_path = os.path.join(output_dir, f"{song_name}.json")
+            with open(out_path, "w", encoding="utf-8") as f:
+                json.dump(song, f, indent=2, ensure_ascii=False)
+            result["outputs"].append(out_path)
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+def assign_output_names(files):
+    """Pick a distinct output name per file, adding the extension (then a counter) when base names clash."""
+    bases = [os.path.splitext(os.path.basename(f))[0] for f in files]
+    base_counts = Counter(bases)
+    names = []
+    used = set()
+    for file_path, base in zip(files, bases):
+        name = base if base_counts[base] == 1 else f"{base}_{os.path.splitext(file_path)[1].lstrip('.').lower()}"
+        candidate = name
+        counter = 2
+        while candidate in used:
+            candidate = f"{name}_{counter}"
+            counter += 1
+        used.add(candidate)
+        names.append(candidate)
+    return names
+
+def collect_import_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(IMPORT_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+def import_files(paths, output_dir, workers=None):
+    """Import files (or directories of files) into output_dir and return one result dict per file."""
+    files = collect_import_files(paths)
+    names = assign_output_names(files)
+    os.makedirs(output_dir, exist_ok=True)
+    if workers == 1 or len(files) <= 1:
+        results = [import_file(file_path, output_dir, name) for file_path, name in zip(files, names)]
+    else:
+        pool_size = workers or os.cpu_count() or 1
+        chunksize = max(1, len(files) // (pool_size * 4))
+        with ProcessPoolExecutor(max_workers=pool_size) as executor:
+            results = list(executor.map(import_file, files, repeat(output_dir), names, chunksize=chunksize))
+    for result in results:
+        if result["error"]:
+            logging.error(f"Failed to import {result['file']}: {result['error']}")
+        else:
+            logging.debug(f"Imported {result['file']} -> {result['outputs']}")
+    logging.info(f"Imported {sum(not r['error'] for r in results)} of {len(results)} files into {output_dir}")
+    return results
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Import MusicXML and ABC files into song JSON.")
+    parser.add_argument("paths", nargs="+", help="MusicXML/ABC files or directories to import.")
+    parser.add_argument("--output_dir", default="./json", help="Directory to save song JSON files.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU).")
+    parser.add_argument("--verbosity", choices=["ERROR", "INFO", "DEBUG"], default="INFO")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging(args.verbosity)
+    results = import_files(args.paths, args.output_dir, args.workers)
+    return 1 if any(result["error"] for result in results) else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
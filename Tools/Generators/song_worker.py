@@ -0,0 +1,214 @@
+# Supervised song rendering: runs each job in a worker process with a
+# wall-clock timeout and a memory budget. A worker that overruns either is
+# killed and replaced, so one pathological song cannot stall a batch.
+#
+# The budget is an absolute resident set size for the worker. It is enforced
+# three ways: the worker caps its address space with RLIMIT_AS so resident
+# memory cannot grow past it, reports its peak RSS after every job, and the
+# supervisor polls the worker's RSS while a job runs.
+
+
+import multiprocessing
+import os
+import sys
+import time
+import logging
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+DEFAULT_TIMEOUT = 120
+DEFAULT_MAX_RSS_MB = 1024
+POLL_INTERVAL = 0.05
+
+def read_proc_status(pid, field):
+    """Return a /proc/<pid>/status memory field in bytes, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def peak_rss():
+    """Return this process's lifetime peak resident set size in bytes."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def current_rss():
+    """Return this process's resident set size in bytes, or its peak where /proc is unavailable."""
+    return read_proc_status(os.getpid(), "VmRSS") or peak_rss()
+
+def reset_job_peak():
+    """Restart the peak RSS measurement (VmHWM) where Linux allows it."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def job_peak_rss():
+    """Return the peak RSS since reset_job_peak(), or the lifetime peak where that is unavailable."""
+    return read_proc_status(os.getpid(), "VmHWM") or peak_rss()
+
+def limit_memory(max_rss_bytes):
+    """Cap this process's address space so its resident memory cannot grow past max_rss_bytes."""
+    if resource is None or not max_rss_bytes:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    # Address space that is mapped but not resident stays available on top of the budget
+    vm_size = read_proc_status(os.getpid(), "VmSize")
+    rss = read_proc_status(os.getpid(), "VmRSS")
+    limit = (vm_size - rss if vm_size and rss else 0) + max_rss_bytes
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError) as e:
+        logging.debug(f"Could not limit worker memory: {e}")
+
+def worker_loop(conn, task, args, finish, max_rss_bytes):
+    """
+    Run task(item, *args, state) for each item received on conn and send back (result, peak rss).
+    The worker first sends its starting RSS, and exits at once if that is already over budget.
+    state is a dict kept for the life of the worker; finish(state) runs on a clean shutdown.
+    A MemoryError escaping the task is reported as a None result.
+    """
+    start_rss = current_rss()
+    conn.send(start_rss)
+    if max_rss_bytes and start_rss >= max_rss_bytes:
+        conn.close()
+        return
+    limit_memory(max_rss_bytes)
+    state = {}
+    try:
+        while True:
+            try:
+                item = conn.recv()
+            except EOFError:
+                break
+            if item is None:
+                break
+            reset_job_peak()
+            try:
+                result = task(item, *args, state)
+            except MemoryError:
+                result = None
+            conn.send((result, job_peak_rss()))
+    finally:
+        if finish is not None:
+            finish(state)
+        conn.close()
+
+class Supervisor:
+    def __init__(self, task, args=(), finish=None, timeout=DEFAULT_TIMEOUT, max_rss_mb=DEFAULT_MAX_RSS_MB):
+        self.task = task
+        self.args = args
+        self.finish = finish
+        self.timeout = timeout
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024 if max_rss_mb else 0
+        # Forked workers inherit the already imported renderers
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        self.process = None
+        self.conn = None
+        self.exitcode = None
+        self.recycled = 0
+
+    def __enter__(self):
+        self._start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _start(self):
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(
+            target=worker_loop,
+            args=(child_conn, self.task, self.args, self.finish, self.max_rss_bytes),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        try:
+            start_rss = self.conn.recv()
+        except (EOFError, OSError):
+            # Reported as a crash by the next run()
+            return
+        if self.max_rss_bytes and start_rss >= self.max_rss_bytes:
+            self.close()
+            raise ValueError(
+                f"Memory budget of {self.max_rss_bytes // (1024 * 1024)} MB is below the worker's "
+                f"starting RSS of {start_rss // (1024 * 1024)} MB")
+
+    def _kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.exitcode = self.process.exitcode
+        self.conn.close()
+        self.process = None
+        self.conn = None
+        self.recycled += 1
+
+    def close(self):
+        """Ask the worker to finish its state and exit, killing it if it does not."""
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(self.timeout or None)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def run(self, item):
+        """
+        Run the task on item in the worker. Returns (result, limit): limit is None on success,
+        or "timeout", "memory" or "crashed", in which case the worker has been replaced.
+        """
+        if self.process is None:
+            self._start()
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        try:
+            self.conn.send(item)
+        except (BrokenPipeError, OSError):
+            self._kill()
+            return None, "crashed"
+        while True:
+            if self.conn.poll(POLL_INTERVAL):
+                try:
+                    result, peak = self.conn.recv()
+                except (EOFError, OSError):
+                    self._kill()
+                    return None, "crashed"
+                if result is None or (self.max_rss_bytes and peak > self.max_rss_bytes):
+                    # Memory the job grew into is rarely given back, so the worker is replaced
+                    self.close()
+                    self.recycled += 1
+                    return result, "memory"
+                return result, None
+            if not self.process.is_alive():
+                self._kill()
+                return None, "crashed"
+            if deadline is not None and time.monotonic() > deadline:
+                self._kill()
+                return None, "timeout"
+            rss = read_proc_status(self.process.pid, "VmRSS")
+            if self.max_rss_bytes and rss is not None and rss > self.max_rss_bytes:
+                self._kill()
+                return None, "memory"
@@ -0,0 +1,134 @@
+# Song timeline: a single integer-tick layout per song shared by the MIDI,
+# MusicXML and ABC writers, so every format agrees on where each chord
+# starts and how long it lasts.
+#
+# Events are stored as parallel arrays (onset, duration, chord id); chord
+# names are interned once per song and sections are spans of event indices.
+# MIDI places every section at its onset. MusicXML and ABC fold repeated
+# sections, so they keep their own written position and use the timeline
+# for chord order and lengths.
+
+
+from array import array
+from fractions import Fraction
+
+TICKS_PER_QUARTER = 960
+DEFAULT_TEMPO = 120
+DEFAULT_METER = "4/4"
+
+def parse_meter(meter_val):
+    """Return (beats, beat_type) for a meter such as "6/8"; "C" and "C|" are accepted."""
+    meter_val = {"C": "4/4", "C|": "2/2"}.get(meter_val, meter_val)
+    try:
+        beats, beat_type = (int(part) for part in str(meter_val).split("/"))
+    except (TypeError, ValueError):
+        return parse_meter(DEFAULT_METER)
+    if beats <= 0 or beat_type <= 0:
+        return parse_meter(DEFAULT_METER)
+    return beats, beat_type
+
+def parse_tempo(tempo_val):
+    """Return beats per minute from a number or an ABC tempo string such as "1/4=120"."""
+    if isinstance(tempo_val, (int, float)) and tempo_val > 0:
+        return tempo_val
+    if isinstance(tempo_val, str) and tempo_val.strip():
+        try:
+            return int(tempo_val.rpartition("=")[2])
+        except ValueError:
+            pass
+    return DEFAULT_TEMPO
+
+class Timeline:
+    def __init__(self, tempo=DEFAULT_TEMPO, meter=DEFAULT_METER, ticks_per_quarter=TICKS_PER_QUARTER):
+        self.tempo = tempo
+        self.beats, self.beat_type = parse_meter(meter)
+        self.ticks_per_quarter = ticks_per_quarter
+        self.measure_ticks = self.beats * ticks_per_quarter * 4 // self.beat_type
+        self.chord_names = []
+        self._chord_ids = {}
+        self.onsets = array("q")
+        self.durations = array("q")
+        self.chord_ids = array("l")
+        # (title, first event index, end event index, lyrics)
+        self.sections = []
+        self.length = 0
+
+    @property
+    def meter(self):
+        return f"{self.beats}/{self.beat_type}"
+
+    def __len__(self):
+        return len(self.onsets)
+
+    def chord_id(self, chord_name):
+        chord_id = self._chord_ids.get(chord_name)
+        if chord_id is None:
+            chord_id = self._chord_ids[chord_name] = len(self.chord_names)
+            self.chord_names.append(chord_name)
+        return chord_id
+
+    def to_ticks(self, quarter_length):
+        return max(1, round(Fraction(quarter_length) * self.ticks_per_quarter))
+
+    def add_section(self, title, chord_names, durations, lyrics):
+        """Append a section's chords; durations are tick lengths parallel to chord_names."""
+        first = len(self.onsets)
+        for chord_name, duration in zip(chord_names, durations):
+            self.onsets.append(self.length)
+            self.durations.append(duration)
+            self.chord_ids.append(self.chord_id(chord_name))
+            self.length += duration
+        self.sections.append((title, first, len(self.onsets), lyrics))
+
+    def section_span(self, section_index):
+        """Return the (start, end) ticks of one section."""
+        _, first, end, _ = self.sections[section_index]
+        start = self.onsets[first] if first < len(self.onsets) else self.length
+        return start, self.onsets[end] if end < len(self.onsets) else self.length
+
+    def section_events(self, section_index):
+        """Return (chord id, duration) pairs for one section; equal sections give equal tuples."""
+        _, first, end, _ = self.sections[section_index]
+        return tuple(zip(self.chord_ids[first:end], self.durations[first:end]))
+
+def build_timeline(song_data):
+    """
+    Lay out a song once from its tempo, meter and per-chord durations.
+    Chords come from "sections" (falling back to the ABC sections, then "midi_progression").
+    A section may list "durations" in quarter notes parallel to its chords; otherwise each
+    chord lasts "midi_duration" quarter notes, or one measure when that is not set.
+    """
+    abc_notation = song_data.get("abc_notation") or {}
+    timeline = Timeline(
+        tempo=parse_tempo(song_data.get("tempo") or abc_notation.get("tempo")),
+        meter=song_data.get("meter") or abc_notation.get("meter") or DEFAULT_METER,
+    )
+    default_quarters = song_data.get("midi_duration")
+    default_ticks = timeline.to_ticks(default_quarters) if default_quarters else timeline.measure_ticks
+
+    sources = [
+        (song_data.get("sections") or [], "progression"),
+        (abc_notation.get("sections") or [], "chords"),
+    ]
+    for sections, chords_field in sources:
+        sections = [section for section in sections if section is not None]
+        if any(section.get(chords_field) for section in sections):
+            break
+    else:
+        progression = song_data.get("midi_progression") or []
+        sections = [{"title": "", "chords": progression}] if progression else []
+        chords_field = "chords"
+
+    for section in sections:
+        chord_names = [
+            tuple(chord_name) if isinstance(chord_name, list) else chord_name
+            for chord_name in section.get(chords_field) or []
+            if chord_name is not None
+        ]
+        quarters = section.get("durations") or []
+        durations = [
+            timeline.to_ticks(quarters[idx]) if idx < len(quarters) and quarters[idx] else default_ticks
+            for idx in range(len(chord_names))
+        ]
+        timeline.add_section(section.get("title", ""), chord_names, durations, section.get("lyrics") or [])
+    return timeline
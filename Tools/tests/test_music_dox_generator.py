@@ -3,11 +3,13 @@ import os
 import sys
 import json
 import subprocess
+import tempfile
 from unittest.mock import patch
 
 # Add the Generators directory to the Python module search path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Generators')))
 import Generators.music_dox_generator as music_dox_generator
+import Generators.song_builder as song_builder
 
 class TestMusicDoxGeneratorCombined(unittest.TestCase):
     @classmethod
@@ -26,6 +28,9 @@ class TestMusicDoxGeneratorCombined(unittest.TestCase):
     def tearDownClass(cls):
         if os.path.exists(cls.cli_json_path):
             os.remove(cls.cli_json_path)
+        cache_path = os.path.join(os.path.dirname(os.path.abspath(cls.cli_json_path)), ".parsed_songs.cache")
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
         if os.path.exists(cls.sample_output_dir):
             for root, dirs, files in os.walk(cls.sample_output_dir, topdown=False):
                 for name in files:
@@ -73,6 +78,16 @@ class TestMusicDoxGeneratorCombined(unittest.TestCase):
         song_data = music_dox_generator.load_song_data(self.sample_json_path)
         self.assertEqual(song_data, self.sample_song_data)
 
+    def test_load_song_data_expands_block_references(self):
+        template_path = os.path.join(os.path.dirname(__file__), '../Generators/templates/stories_we_dont_tell.json')
+        with tempfile.TemporaryDirectory() as json_dir:
+            song_path = song_builder.build_songs([template_path], json_dir)[0]
+            song_data = music_dox_generator.load_song_data(song_path)
+        self.assertNotIn("blocks", song_data)
+        self.assertEqual(len(song_data["sections"]), 7)
+        self.assertEqual(song_data["sections"][6]["progression"], ["Bm", "G", "D", "A", "Bm", "G", "Bb", "A"])
+        self.assertIn("Bridge Progression", song_data["sections"][6]["content"])
+
     def test_ensure_directory_exists(self):
         music_dox_generator.ensure_directory_exists(self.sample_output_dir)
         self.assertTrue(os.path.exists(self.sample_output_dir))
@@ -102,6 +117,110 @@ class TestMusicDoxGeneratorCombined(unittest.TestCase):
         mock_generate_abc.assert_called_once_with(self.sample_song_data, abc_path)
         mock_generate_musicxml.assert_called_once_with(self.sample_song_data, xml_path)
 
+    def test_get_chord_pitches_returns_new_pitches(self):
+        chord_notes = {"D": [62, 66, 69], "C": [60, 64, 67]}
+        first = music_dox_generator.get_chord_pitches(chord_notes, "D")
+        second = music_dox_generator.get_chord_pitches(chord_notes, "D")
+        self.assertEqual([p.midi for p in first], [62, 66, 69])
+        self.assertEqual([p.midi for p in second], [62, 66, 69])
+        self.assertIsNot(first[0], second[0])
+
+    def test_insert_measures_uses_precomputed_offsets(self):
+        from music21 import stream
+        part = stream.Part()
+        measures = [stream.Measure(number=i + 1) for i in range(5)]
+        music_dox_generator.insert_measures(part, measures)
+        self.assertEqual([m.offset for m in part.getElementsByClass(stream.Measure)], [0, 4, 8, 12, 16])
+
+    def test_group_repeats(self):
+        groups = music_dox_generator.group_repeats([
+            ["D", "C"], ["D", "C"], ["G"], ["D", "C", "A"], ["D", "C", "Bb"], [], [],
+        ])
+        self.assertEqual(groups, [([0, 1], 2), ([2], 1), ([3, 4], 2), ([5], 0), ([6], 0)])
+
+    def test_group_repeats_keeps_non_consecutive_repeats(self):
+        groups = music_dox_generator.group_repeats([["D", "C"], ["G"], ["D", "C"]])
+        self.assertEqual(groups, [([0], 2), ([1], 1), ([2], 2)])
+
+    def test_encode_midi_block_is_position_independent(self):
+        lead, data, tail = music_dox_generator.encode_midi_block((((), 960), ((60, 64), 960), ((), 960)), 80)
+        self.assertEqual(lead, 960)
+        self.assertEqual(tail, 960)
+        self.assertEqual(data, bytes([0x90, 60, 80, 0, 0x90, 64, 80, 0x87, 0x40, 0x80, 60, 80, 0, 0x80, 64, 80]))
+
+    def test_key_signature(self):
+        self.assertEqual(music_dox_generator.key_signature("Bb").sharps, -2)
+        f_sharp_minor = music_dox_generator.key_signature("F#m")
+        self.assertEqual((f_sharp_minor.sharps, f_sharp_minor.mode), (3, "minor"))
+        self.assertIsNone(music_dox_generator.key_signature("Dmix"))
+
+    def test_measure_writer_copies_one_symbol_per_chord(self):
+        song = music_dox_generator.build_timeline({"midi_progression": ["D", "C", "D", "C"]})
+        writer = music_dox_generator.MeasureWriter(song, {})
+        with patch('Generators.music_dox_generator.chord_symbol', wraps=music_dox_generator.chord_symbol) as mock_chord_symbol:
+            for chord_id, duration_ticks in zip(song.chord_ids, song.durations):
+                writer.write(chord_id, duration_ticks, [])
+        self.assertEqual(mock_chord_symbol.call_count, 2)
+        symbols = [element for measure in writer.finish() for element in measure if isinstance(element, music_dox_generator.harmony.ChordSymbol)]
+        self.assertEqual([symbol.figure for symbol in symbols], ["D", "C", "D", "C"])
+        self.assertIsNot(symbols[0], symbols[2])
+
+    def test_generate_abc_writes_repeats_once(self):
+        song_data = {"abc_notation": {"sections": [
+            {"title": "Chorus 1", "chords": ["D", "C"], "lyrics": ["one"]},
+            {"title": "Chorus 2", "chords": ["D", "C"], "lyrics": ["two"]},
+            {"title": "Outro", "chords": ["G"], "lyrics": []},
+        ]}}
+        abc_path = os.path.join(self.sample_output_dir, "repeats.abc")
+        music_dox_generator.ensure_directory_exists(self.sample_output_dir)
+        music_dox_generator.generate_abc(song_data, abc_path)
+        with open(abc_path, "r") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[7:], [
+            "%% Chorus 1 / Chorus 2", '|: "D"x8 | "C"x8 :|', "w: one", "w: two",
+            "%% Outro", '"G"x8 |', "w: ",
+        ])
+
+    def test_generate_abc_follows_meter_and_durations(self):
+        song_data = {"tempo": 90, "meter": "3/4", "sections": [
+            {"title": "Verse", "progression": ["D", "G", "A"], "durations": [2, 4, 1.5], "lyrics": []},
+        ]}
+        abc_path = os.path.join(self.sample_output_dir, "timing.abc")
+        music_dox_generator.ensure_directory_exists(self.sample_output_dir)
+        music_dox_generator.generate_abc(song_data, abc_path)
+        with open(abc_path, "r") as f:
+            lines = f.read().splitlines()
+        self.assertIn("M:3/4", lines)
+        self.assertIn("Q:1/4=90", lines)
+        self.assertEqual(lines[8], '"D"x4 "G"x2 | x6 | "A"x3')
+
+    def test_generate_abc_writes_unmeasured_repeats_out(self):
+        # Three half-measure chords leave the second pass starting mid-measure
+        song_data = {"midi_duration": 2, "sections": [
+            {"title": "A1", "progression": ["D", "C", "G"], "lyrics": []},
+            {"title": "A2", "progression": ["D", "C", "G"], "lyrics": []},
+            {"title": "B", "progression": ["E", "F", "A", "B"], "lyrics": []},
+        ]}
+        abc_path = os.path.join(self.sample_output_dir, "unmeasured.abc")
+        music_dox_generator.ensure_directory_exists(self.sample_output_dir)
+        music_dox_generator.generate_abc(song_data, abc_path)
+        with open(abc_path, "r") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[7:], [
+            "%% A1", '"D"x4 "C"x4 | "G"x4', "w: ",
+            "%% A2", '"D"x4 | "C"x4 "G"x4 |', "w: ",
+            "%% B", '"E"x4 "F"x4 | "A"x4 "B"x4 |', "w: ",
+        ])
+
+    def test_generate_abc_skips_midi_number_chord_names(self):
+        song_data = {"midi_progression": [[60, 64, 67], [62, 65, 69]]}
+        abc_path = os.path.join(self.sample_output_dir, "numbers.abc")
+        music_dox_generator.ensure_directory_exists(self.sample_output_dir)
+        music_dox_generator.generate_abc(song_data, abc_path)
+        with open(abc_path, "r") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[8], "x8 | x8 |")
+
     # Utility function to check if a PDF file is valid (basic check: file exists and starts with %PDF)
     def is_valid_pdf(self, file_path):
         if not os.path.exists(file_path):
@@ -200,6 +319,80 @@ class TestMusicDoxGeneratorCombined(unittest.TestCase):
                 print(f"[DEBUG] MusicXML first 200 chars: {f.read(200)}")
         self.assertTrue(self.is_valid_musicxml(xml_path), msg="Invalid or missing MusicXML output.")
 
+    def test_run_batch_in_process(self):
+        options = music_dox_generator.build_parser().parse_args(["--output_dir", self.sample_output_dir, "--overwrite"])
+        results = music_dox_generator.run_batch([self.cli_json_path, "missing_song.json"], options)
+        self.assertEqual(len(results), 2)
+        ok, missing = results
+        self.assertTrue(ok["ok"], msg=ok)
+        self.assertIsNone(ok["error"])
+        self.assertEqual(sorted(ok["outputs"]), ["abc", "midi", "musicxml", "pdf"])
+        self.assertTrue(self.is_valid_pdf(ok["outputs"]["pdf"]))
+        self.assertTrue(self.is_valid_midi(ok["outputs"]["midi"]))
+        self.assertTrue(self.is_valid_abc(ok["outputs"]["abc"]))
+        self.assertTrue(self.is_valid_musicxml(ok["outputs"]["musicxml"]))
+        self.assertFalse(missing["ok"])
+        self.assertIsNotNone(missing["error"])
+
+    @patch('Generators.music_dox_generator.SongCache')
+    def test_run_batch_no_parse_cache(self, mock_song_cache):
+        options = music_dox_generator.build_parser().parse_args(
+            ["--output_dir", self.sample_output_dir, "--overwrite", "--no-parse-cache"])
+        results = music_dox_generator.run_batch([self.cli_json_path], options)
+        self.assertTrue(results[0]["ok"], msg=results[0])
+        mock_song_cache.assert_not_called()
+
+    @patch('Generators.music_dox_generator.Supervisor.run')
+    def test_run_batch_isolated_reports_limits(self, mock_run):
+        mock_run.side_effect = [
+            (music_dox_generator.process_song(self.cli_json_path, music_dox_generator.build_parser().parse_args(
+                ["--output_dir", self.sample_output_dir, "--overwrite"])), None),
+            (None, "timeout"),
+        ]
+        options = music_dox_generator.build_parser().parse_args(
+            ["--output_dir", self.sample_output_dir, "--overwrite", "--isolate", "--timeout", "5"])
+        ok, slow = music_dox_generator.run_batch([self.cli_json_path, "slow_song.json"], options)
+        self.assertTrue(ok["ok"], msg=ok)
+        self.assertIsNone(ok["limit"])
+        self.assertFalse(slow["ok"])
+        self.assertEqual(slow["limit"], "timeout")
+        self.assertEqual(slow["error"], "timed out after 5s")
+
+    @patch('Generators.music_dox_generator.generate_musicxml', side_effect=MemoryError)
+    def test_run_batch_isolated_reports_memory_errors(self, mock_generate_musicxml):
+        options = music_dox_generator.build_parser().parse_args(
+            ["--output_dir", self.sample_output_dir, "--overwrite", "--isolate", "--timeout", "60"])
+        result = music_dox_generator.run_batch([self.cli_json_path], options)[0]
+        self.assertFalse(result["ok"])
+        self.assertEqual(result["limit"], "memory")
+
+    @patch('Generators.music_dox_generator.generate_musicxml', side_effect=[MemoryError, True])
+    def test_run_batch_in_process_continues_after_memory_error(self, mock_generate_musicxml):
+        options = music_dox_generator.build_parser().parse_args(["--output_dir", self.sample_output_dir, "--overwrite"])
+        failed, ok = music_dox_generator.run_batch([self.cli_json_path, self.cli_json_path], options)
+        self.assertFalse(failed["ok"])
+        self.assertEqual(failed["limit"], "memory")
+        self.assertEqual(failed["error"], "ran out of memory")
+        self.assertTrue(ok["ok"], msg=ok)
+
+    def test_run_batch_isolated_renders_in_worker(self):
+        options = music_dox_generator.build_parser().parse_args(
+            ["--output_dir", self.sample_output_dir, "--overwrite", "--isolate", "--timeout", "60"])
+        results = music_dox_generator.run_batch([self.cli_json_path], options)
+        self.assertTrue(results[0]["ok"], msg=results[0])
+        self.assertTrue(self.is_valid_musicxml(results[0]["outputs"]["musicxml"]))
+
+    @patch('Generators.music_dox_generator.build_timeline', wraps=music_dox_generator.build_timeline)
+    def test_process_song_builds_timeline_once(self, mock_build_timeline):
+        options = music_dox_generator.build_parser().parse_args(["--output_dir", self.sample_output_dir, "--overwrite"])
+        result = music_dox_generator.process_song(self.cli_json_path, options)
+        self.assertTrue(result["ok"], msg=result)
+        mock_build_timeline.assert_called_once()
+
+    def test_main_in_process(self):
+        exit_code = music_dox_generator.main([self.cli_json_path, "--output_dir", self.sample_output_dir, "--overwrite"])
+        self.assertEqual(exit_code, 0)
+
     def test_all_json_files_in_directory(self):
         # TODO: Add automated fix and retest
         """
@@ -224,7 +417,8 @@ class TestMusicDoxGeneratorCombined(unittest.TestCase):
             missing_fields = {}
             try:
                 with open(file_path, 'r') as f:
-                    data = json.load(f)
+                    # Songs written by song_builder are checked as the generator renders them
+                    data = song_builder.expand_song(json.load(f))
                 # Basic required fields
                 required_fields = [
                     "title", "composer", "tempo", "key", "meter", "unit_note_length",
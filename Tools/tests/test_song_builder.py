@@ -0,0 +1,103 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+
+# Add the Generators directory to the Python module search path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Generators')))
+import Generators.song_builder as song_builder
+
+class TestSongBuilder(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.template_path = os.path.join(os.path.dirname(__file__), '../Generators/templates/stories_we_dont_tell.json')
+        cls.template = song_builder.load_template(cls.template_path)
+
+    def test_chord_diagram_matches_hand_written_chart(self):
+        expected = "D Major Chord\ne|-2-\nB|-3-\nG|-2-\nD|-0-\nA|---\nE|---\n"
+        self.assertEqual(song_builder.chord_diagram("D"), expected)
+        self.assertEqual(song_builder.chord_voicing("Bb"), (1, 1, 3, 3, 3, 1))
+
+    def test_chord_diagram_is_memoized(self):
+        song_builder.chord_diagram.cache_clear()
+        first = song_builder.chord_diagram("G")
+        second = song_builder.chord_diagram("G")
+        self.assertIs(first, second)
+        self.assertEqual(song_builder.chord_diagram.cache_info().misses, 1)
+
+    def test_chord_diagrams_deduplicates_in_order(self):
+        diagrams = song_builder.chord_diagrams(["Bm", "G", "D", "A", "Bm", "G", "Bb", "A"])
+        titles = [line for line in diagrams.splitlines() if line.endswith("Chord")]
+        self.assertEqual(titles, ["Bm Chord", "G Major Chord", "D Major Chord", "A Major Chord", "Bb Major Chord"])
+
+    def test_unknown_chord_raises(self):
+        with self.assertRaises(KeyError):
+            song_builder.chord_voicing("H#13")
+
+    def test_render_template_keeps_block_references(self):
+        songs = list(song_builder.render_template(self.template))
+        self.assertEqual(len(songs), 1)
+        file_name, song = songs[0]
+        self.assertEqual(file_name, "Stories_We_Dont_Tell.json")
+        self.assertEqual(song["tempo"], 136)
+        self.assertEqual(sorted(song["blocks"]), ["bridge", "chorus", "verse"])
+        self.assertEqual([section["use"] for section in song["sections"]],
+                         ["chorus", "verse", "chorus", "verse", "chorus", "verse", "bridge"])
+        for section in song["sections"]:
+            self.assertNotIn("content", section)
+            self.assertNotIn("progression", section)
+        self.assertNotIn("sections", song["abc_notation"])
+
+    def test_expand_song_resolves_blocks(self):
+        _, song = next(song_builder.render_template(self.template))
+        expanded = song_builder.expand_song(song)
+        self.assertNotIn("blocks", expanded)
+        self.assertEqual(len(expanded["sections"]), 7)
+        chorus, verse = expanded["sections"][0], expanded["sections"][1]
+        self.assertEqual(chorus["progression"], ["D", "D", "C", "C", "D", "D", "C", "C", "Bb", "A"])
+        self.assertTrue(chorus["content"].startswith("Chorus Progression: D - D - C - C"))
+        self.assertNotIn("Chord\n", chorus["content"])
+        self.assertIn(song_builder.chord_diagram("Bb"), verse["content"])
+        self.assertEqual(len(expanded["abc_notation"]["sections"]), 7)
+        self.assertIs(song_builder.expand_song(expanded), expanded)
+
+    def test_render_song_unknown_block_raises(self):
+        with self.assertRaises(KeyError):
+            song_builder.render_song({"sections": [{"use": "outro"}]}, blocks={})
+
+    def test_build_songs_writes_valid_json(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            written = song_builder.build_songs([self.template_path], output_dir)
+            self.assertEqual(len(written), 1)
+            with open(written[0], "r", encoding="utf-8") as f:
+                data = song_builder.expand_song(json.load(f))
+            for field in ["title", "composer", "tempo", "key", "meter", "unit_note_length",
+                          "midi_duration", "midi_volume", "midi_chords", "sections"]:
+                self.assertIn(field, data)
+            for section in data["sections"]:
+                for sfield in ["title", "progression", "lyrics", "strumming_pattern"]:
+                    self.assertIn(sfield, section)
+
+    def test_build_songs_skips_songs_with_unknown_chords(self):
+        template = {
+            "blocks": {
+                "odd": {"progression": ["H#13"], "diagrams": True},
+                "verse": {"progression": ["D", "G"], "diagrams": True},
+            },
+            "songs": [
+                {"title": "Odd", "sections": [{"use": "odd"}]},
+                {"title": "Fine", "sections": [{"use": "verse"}]},
+            ],
+        }
+        with tempfile.TemporaryDirectory() as output_dir:
+            template_path = os.path.join(output_dir, "template.json")
+            with open(template_path, "w", encoding="utf-8") as f:
+                json.dump(template, f)
+            with self.assertLogs(level="ERROR") as logs:
+                written = song_builder.build_songs([template_path], output_dir)
+            self.assertEqual([os.path.basename(path) for path in written], ["Fine.json"])
+            self.assertIn("H#13", logs.output[0])
+
+if __name__ == "__main__":
+    unittest.main()
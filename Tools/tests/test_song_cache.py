@@ -0,0 +1,115 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+
+# Add the Generators directory to the Python module search path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Generators')))
+import Generators.song_cache as song_cache
+
+class TestSongCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.json_dir = self.tmp_dir.name
+        self.loads = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_song(self, name, song_data):
+        path = os.path.join(self.json_dir, name)
+        with open(path, "w") as f:
+            json.dump(song_data, f)
+        return path
+
+    def loader(self, file_path):
+        self.loads.append(os.path.basename(file_path))
+        with open(file_path, "r") as f:
+            return json.load(f)
+
+    def test_unchanged_song_loads_from_cache(self):
+        path = self.write_song("a.json", {"title": "A", "sections": [{"progression": ["D", "C"]}]})
+        cache = song_cache.SongCache(self.json_dir)
+        first = cache.load(path, self.loader)
+        cache.save()
+        cache.close()
+        self.assertTrue(os.path.exists(os.path.join(self.json_dir, song_cache.CACHE_FILE_NAME)))
+
+        cache = song_cache.SongCache(self.json_dir)
+        second = cache.load(path, self.loader)
+        cache.close()
+        self.assertEqual(first, second)
+        self.assertEqual(self.loads, ["a.json"])
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_modified_song_is_reparsed(self):
+        path = self.write_song("a.json", {"title": "A"})
+        cache = song_cache.SongCache(self.json_dir)
+        cache.load(path, self.loader)
+        cache.save()
+        cache.close()
+        self.write_song("a.json", {"title": "A longer title"})
+
+        cache = song_cache.SongCache(self.json_dir)
+        self.assertEqual(cache.load(path, self.loader), {"title": "A longer title"})
+        cache.close()
+        self.assertEqual(self.loads, ["a.json", "a.json"])
+
+    def test_size_cap_evicts_least_recently_used(self):
+        paths = [self.write_song(f"{name}.json", {"title": name * 200}) for name in "abc"]
+        cache = song_cache.SongCache(self.json_dir, max_bytes=250)
+        for path in paths:
+            cache.load(path, self.loader)
+        cache.save()
+        self.assertEqual(sorted(cache.index), ["c.json"])
+        cache.close()
+
+    def test_hits_are_remembered_for_eviction(self):
+        a, b, c = (self.write_song(f"{name}.json", {"title": name * 200}) for name in "abc")
+        cache = song_cache.SongCache(self.json_dir)
+        cache.load(a, self.loader)
+        cache.load(b, self.loader)
+        cache.save()
+        cache.close()
+
+        # A run that only hits a must still record that a was used after b
+        cache = song_cache.SongCache(self.json_dir)
+        cache.load(a, self.loader)
+        cache.save()
+        cache.close()
+
+        cache = song_cache.SongCache(self.json_dir, max_bytes=500)
+        cache.load(c, self.loader)
+        cache.save()
+        self.assertEqual(sorted(cache.index), ["a.json", "c.json"])
+        self.assertEqual(cache.load(a, self.loader), {"title": "a" * 200})
+        cache.close()
+        self.assertEqual(self.loads, ["a.json", "b.json", "c.json"])
+
+    def test_deleted_song_is_dropped(self):
+        keep = self.write_song("keep.json", {"title": "keep"})
+        gone = self.write_song("gone.json", {"title": "gone"})
+        cache = song_cache.SongCache(self.json_dir)
+        cache.load(keep, self.loader)
+        cache.load(gone, self.loader)
+        os.remove(gone)
+        cache.save()
+        self.assertEqual(sorted(cache.index), ["keep.json"])
+        cache.close()
+
+    def test_corrupt_cache_file_is_ignored(self):
+        path = self.write_song("a.json", {"title": "A"})
+        with open(os.path.join(self.json_dir, song_cache.CACHE_FILE_NAME), "wb") as f:
+            f.write(b"not a cache file at all")
+        cache = song_cache.SongCache(self.json_dir)
+        self.assertEqual(cache.load(path, self.loader), {"title": "A"})
+        cache.save()
+        cache.close()
+        cache = song_cache.SongCache(self.json_dir)
+        cache.load(path, self.loader)
+        cache.close()
+        self.assertEqual(self.loads, ["a.json"])
+
+if __name__ == "__main__":
+    unittest.main()
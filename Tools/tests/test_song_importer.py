@@ -0,0 +1,247 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+
+# Add the Generators directory to the Python module search path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Generators')))
+import Generators.music_dox_generator as music_dox_generator
+import Generators.song_importer as song_importer
+import Generators.song_builder as song_builder
+
+TEMPLATE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../Generators/templates/stories_we_dont_tell.json'))
+
+def make_section(title, progression, lyrics):
+    return {"title": title, "progression": progression, "lyrics": lyrics, "strumming_pattern": []}
+
+class TestSongImporter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        verse = ["D", "C", "Bb", "A"]
+        cls.song_data = {
+            "title": "Round Trip",
+            "tempo": 100,
+            "key": "Bm",
+            "midi_chords": {
+                "D": [62, 66, 69], "C": [60, 64, 67], "Bb": [58, 62, 65],
+                "A": [57, 61, 64], "Bm": [59, 62, 66], "G": [55, 59, 62],
+            },
+            "sections": [
+                make_section("Intro", ["G", "D"], ["hi there"]),
+                make_section("Verse 1", verse, ["a", "b", "c", "d"]),
+                make_section("Verse 2", verse, ["e", "f"]),
+                make_section("Pre 1", ["Bm", "G", "D", "A"], ["p1"]),
+                make_section("Pre 2", ["Bm", "G", "D", "C"], ["p2", "q2", "r2", "s2"]),
+                make_section("Bridge", ["Bm", "Bb"], []),
+            ],
+        }
+        cls.song_data["abc_notation"] = {
+            "title": "Round Trip",
+            "key": "Bm",
+            "sections": [
+                {"title": s["title"], "chords": s["progression"], "lyrics": s["lyrics"]}
+                for s in cls.song_data["sections"]
+            ],
+        }
+        cls.expected_sections = [(s["title"], s["progression"], s["lyrics"]) for s in cls.song_data["sections"]]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.work_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def imported_sections(self, song):
+        return [(s["title"], s["progression"], s["lyrics"]) for s in song["sections"]]
+
+    def write_file(self, name, content):
+        path = os.path.join(self.work_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_musicxml_round_trip(self):
+        xml_path = os.path.join(self.work_dir, "round_trip.musicxml")
+        self.assertTrue(music_dox_generator.generate_musicxml(self.song_data, xml_path))
+        songs = song_importer.parse_musicxml(xml_path)
+        self.assertEqual(len(songs), 1)
+        self.assertEqual(songs[0]["title"], "Round Trip")
+        self.assertEqual(songs[0]["key"], "Bm")
+        self.assertEqual(self.imported_sections(songs[0]), self.expected_sections)
+        self.assertEqual(songs[0]["midi_chords"], self.song_data["midi_chords"])
+
+    def test_musicxml_round_trip_keeps_template_chord_names(self):
+        # The template voicings are root-fifth-octave, which cannot be named from pitches alone
+        song_builder.build_songs([TEMPLATE_PATH], self.work_dir)
+        song_data = music_dox_generator.load_song_data(os.path.join(self.work_dir, "Stories_We_Dont_Tell.json"))
+        xml_path = os.path.join(self.work_dir, "stories.musicxml")
+        self.assertTrue(music_dox_generator.generate_musicxml(song_data, xml_path))
+        song = song_importer.parse_musicxml(xml_path)[0]
+        expected = [(s["title"], s["progression"], s["lyrics"]) for s in song_data["sections"]]
+        self.assertEqual(self.imported_sections(song), expected)
+        self.assertEqual(song["key"], "D")
+        self.assertEqual(song["midi_chords"], song_data["midi_chords"])
+
+    def test_musicxml_round_trip_with_chords_shorter_than_a_measure(self):
+        song_data = {
+            "title": "Half Notes", "midi_duration": 2,
+            "midi_chords": {"D": [62, 66, 69], "C": [60, 64, 67]},
+            "sections": [make_section("Verse", ["D", "D", "C", "C"], ["a", "b", "c", "d"])],
+        }
+        xml_path = os.path.join(self.work_dir, "half_notes.musicxml")
+        self.assertTrue(music_dox_generator.generate_musicxml(song_data, xml_path))
+        song = song_importer.parse_musicxml(xml_path)[0]
+        self.assertEqual(self.imported_sections(song), [("Verse", ["D", "D", "C", "C"], ["a", "b", "c", "d"])])
+        self.assertEqual(song["sections"][0]["durations"], [2, 2, 2, 2])
+
+    def test_round_trip_keeps_chord_durations(self):
+        song_data = {
+            "title": "Waltz", "meter": "3/4",
+            "midi_chords": {"D": [62, 66, 69], "C": [60, 64, 67], "G": [55, 59, 62]},
+            "sections": [dict(make_section("Verse", ["D", "C", "G", "D"], ["a", "b"]), durations=[1.5, 1.5, 3, 6])],
+        }
+        song_data["abc_notation"] = {"sections": [{"title": "Verse", "chords": [], "lyrics": []}]}
+        xml_path = os.path.join(self.work_dir, "waltz.musicxml")
+        abc_path = os.path.join(self.work_dir, "waltz.abc")
+        self.assertTrue(music_dox_generator.generate_musicxml(song_data, xml_path))
+        self.assertTrue(music_dox_generator.generate_abc(song_data, abc_path))
+        for song in (song_importer.parse_musicxml(xml_path)[0], song_importer.parse_abc(abc_path)[0]):
+            self.assertEqual(song["sections"][0]["progression"], ["D", "C", "G", "D"])
+            self.assertEqual(song["sections"][0]["durations"], [1.5, 1.5, 3, 6])
+
+    def test_musicxml_round_trip_with_sections_starting_mid_measure(self):
+        song_data = {
+            "title": "Half Measures", "midi_duration": 2,
+            "midi_chords": {"D": [62, 66, 69], "C": [60, 64, 67], "G": [55, 59, 62], "E": [52, 56, 59],
+                            "F": [53, 57, 60], "A": [57, 61, 64], "B": [59, 63, 66]},
+            "sections": [
+                make_section("A1", ["D", "C", "G"], ["a", "b", "c"]),
+                make_section("A2", ["D", "C", "G"], ["d", "e", "f"]),
+                make_section("B", ["E", "F", "A", "B"], []),
+            ],
+        }
+        xml_path = os.path.join(self.work_dir, "half_measures.musicxml")
+        self.assertTrue(music_dox_generator.generate_musicxml(song_data, xml_path))
+        song = song_importer.parse_musicxml(xml_path)[0]
+        self.assertEqual(self.imported_sections(song), [(s["title"], s["progression"], s["lyrics"]) for s in song_data["sections"]])
+
+    def test_abc_round_trip(self):
+        abc_path = os.path.join(self.work_dir, "round_trip.abc")
+        self.assertTrue(music_dox_generator.generate_abc(self.song_data, abc_path))
+        songs = song_importer.parse_abc(abc_path)
+        self.assertEqual(len(songs), 1)
+        self.assertEqual(songs[0]["title"], "Round Trip")
+        self.assertEqual(songs[0]["key"], "Bm")
+        self.assertEqual(self.imported_sections(songs[0]), self.expected_sections)
+        self.assertEqual(songs[0]["midi_chords"]["D"], [62, 66, 69])
+
+    def test_abc_quoted_chords_and_multiple_tunes(self):
+        abc_path = self.write_file("tunes.abc", "\n".join([
+            "X:1", "T:First", "M:3/4", "Q:1/4=90", "K:G",
+            "P:A",
+            '|: "G" B2 d2 | "Em" e4 [CEG] :|',
+            "P:B",
+            '"C" c6 | "D7" d6 |]',
+            "",
+            "X:2", "T:Second", "K:D",
+            '"D" d4 | "A" a4 |',
+        ]))
+        first, second = song_importer.parse_abc(abc_path)
+        self.assertEqual(first["title"], "First")
+        self.assertEqual(first["tempo"], 90)
+        self.assertEqual(first["meter"], "3/4")
+        self.assertEqual(first["midi_duration"], 3)
+        self.assertEqual([(s["title"], s["progression"]) for s in first["sections"]],
+                         [("A", ["G", "Em"]), ("A", ["G", "Em"]), ("B", ["C", "D7"])])
+        self.assertEqual(first["sections"][0]["durations"], [2, 2.5])
+        self.assertEqual(first["sections"][2]["durations"], [3, 3])
+        self.assertEqual(second["title"], "Second")
+        self.assertEqual(second["sections"][0]["progression"], ["D", "A"])
+
+    def test_abc_durations_follow_note_lengths(self):
+        abc_path = self.write_file("rhythm.abc", "\n".join([
+            "X:1", "T:Rhythm", "M:4/4", "L:1/8", "K:G",
+            '"G" A>B {g}c2 !trill!d2 [CEG]2 | "C" (3ABc d2 z2 e/f/ g | Z2 |',
+            '"D" A<B c6 % a comment, not notes',
+            '"Em" [K:D] x8 |',
+        ]))
+        section = song_importer.parse_abc(abc_path)[0]["sections"][0]
+        self.assertEqual(section["progression"], ["G", "C", "D", "Em"])
+        self.assertEqual(section["durations"], [4, 12, 4, 4])
+
+    def test_abc_ignores_directives_and_play_order(self):
+        abc_path = self.write_file("directives.abc", "\n".join([
+            "X:1", "T:Parts", "P:ABA", "M:4/4", "%%MIDI program 25", "K:G",
+            "%%staffsep 40",
+            "P:A",
+            '"G"x8 | "D"x8 |',
+            "%% Chorus",
+            '"C"x8 |',
+        ]))
+        song = song_importer.parse_abc(abc_path)[0]
+        self.assertEqual([(s["title"], s["progression"]) for s in song["sections"]],
+                         [("A", ["G", "D"]), ("Chorus", ["C"])])
+
+    def test_musicxml_harmony_and_attributes(self):
+        xml_path = self.write_file("lead_sheet.musicxml", """<?xml version="1.0" encoding="UTF-8"?>
+<score-partwise version="3.1">
+  <work><work-title>Lead Sheet</work-title></work>
+  <identification><creator type="composer">Someone</creator></identification>
+  <part-list><score-part id="P1"><part-name>Voice</part-name></score-part></part-list>
+  <part id="P1">
+    <measure number="1">
+      <attributes><divisions>1</divisions><key><fifths>-1</fifths><mode>minor</mode></key>
+        <time><beats>6</beats><beat-type>8</beat-type></time></attributes>
+      <direction><sound tempo="72"/></direction>
+      <harmony><root><root-step>D</root-step></root><kind>minor</kind></harmony>
+      <note><pitch><step>D</step><octave>4</octave></pitch><duration>3</duration>
+        <lyric number="1"><syllabic>begin</syllabic><text>Hel</text></lyric></note>
+      <harmony><root><root-step>B</root-step><root-alter>-1</root-alter></root><kind>major-seventh</kind></harmony>
+      <note><pitch><step>F</step><octave>4</octave></pitch><duration>3</duration>
+        <lyric number="1"><syllabic>end</syllabic><text>lo</text></lyric></note>
+    </measure>
+  </part>
+</score-partwise>
+""")
+        song = song_importer.parse_musicxml(xml_path)[0]
+        self.assertEqual(song["title"], "Lead Sheet")
+        self.assertEqual(song["composer"], "Someone")
+        self.assertEqual(song["key"], "Dm")
+        self.assertEqual(song["meter"], "6/8")
+        self.assertEqual(song["tempo"], 72)
+        self.assertEqual(self.imported_sections(song), [("Section 1", ["Dm", "Bbmaj7"], ["Hel-", "lo"])])
+        self.assertEqual(song["midi_chords"]["Bbmaj7"], [58, 62, 65, 69])
+
+    def test_name_chord(self):
+        self.assertEqual(song_importer.name_chord([(62, "D", 0), (66, "F", 1), (69, "A", 0)]), "D")
+        self.assertEqual(song_importer.name_chord([(64, "E", 0), (67, "G", 0), (72, "C", 0)]), "C")
+        self.assertEqual(song_importer.name_chord([(59, "B", 0), (62, "D", 0), (66, "F", 1)]), "Bm")
+
+    def test_import_files_with_process_pool(self):
+        music_dox_generator.generate_musicxml(self.song_data, os.path.join(self.work_dir, "song.musicxml"))
+        music_dox_generator.generate_abc(self.song_data, os.path.join(self.work_dir, "song.abc"))
+        self.write_file("broken.musicxml", "<score-partwise><part>")
+        output_dir = os.path.join(self.work_dir, "json")
+        results = song_importer.import_files([self.work_dir], output_dir, workers=2)
+        errors = {os.path.basename(r["file"]): r["error"] for r in results}
+        self.assertIsNotNone(errors.pop("broken.musicxml"))
+        self.assertEqual(errors, {"song.abc": None, "song.musicxml": None})
+        self.assertEqual(sorted(os.listdir(output_dir)), ["song_abc.json", "song_musicxml.json"])
+        with open(os.path.join(output_dir, "song_musicxml.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for field in ["title", "composer", "tempo", "key", "meter", "unit_note_length",
+                      "midi_duration", "midi_volume", "midi_chords", "sections", "abc_notation"]:
+            self.assertIn(field, data)
+
+    def test_import_command_dispatch(self):
+        abc_path = os.path.join(self.work_dir, "song.abc")
+        music_dox_generator.generate_abc(self.song_data, abc_path)
+        output_dir = os.path.join(self.work_dir, "json")
+        exit_code = music_dox_generator.main(["import", abc_path, "--output_dir", output_dir])
+        self.assertEqual(exit_code, 0)
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "song.json")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import os
+import sys
+import time
+
+# Add the Generators directory to the Python module search path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Generators')))
+import Generators.song_worker as song_worker
+
+def run_job(job, state):
+    state["jobs"] = state.get("jobs", 0) + 1
+    if job == "sleep":
+        time.sleep(30)
+    elif job == "allocate":
+        return len(bytearray(512 * 1024 * 1024))
+    elif job == "exit":
+        os._exit(3)
+    return (job, os.getpid(), state["jobs"])
+
+class TestSupervisor(unittest.TestCase):
+    def test_worker_is_reused_between_jobs(self):
+        with song_worker.Supervisor(run_job, timeout=10, max_rss_mb=0) as supervisor:
+            first, first_limit = supervisor.run("a")
+            second, second_limit = supervisor.run("b")
+        self.assertIsNone(first_limit)
+        self.assertIsNone(second_limit)
+        self.assertEqual(first[1], second[1])
+        self.assertEqual(second[2], 2)
+        self.assertEqual(supervisor.recycled, 0)
+
+    def test_timeout_kills_and_replaces_worker(self):
+        with song_worker.Supervisor(run_job, timeout=0.5, max_rss_mb=0) as supervisor:
+            started = time.monotonic()
+            result, limit = supervisor.run("sleep")
+            self.assertLess(time.monotonic() - started, 10)
+            after, after_limit = supervisor.run("after")
+        self.assertEqual((result, limit), (None, "timeout"))
+        self.assertIsNone(after_limit)
+        self.assertEqual(after[2], 1)
+        self.assertEqual(supervisor.recycled, 1)
+
+    def budget_above_current_rss(self, headroom_mb):
+        return song_worker.current_rss() // (1024 * 1024) + headroom_mb
+
+    @unittest.skipIf(song_worker.resource is None, "resource limits are not available")
+    def test_memory_budget_is_enforced(self):
+        with song_worker.Supervisor(run_job, timeout=10, max_rss_mb=self.budget_above_current_rss(64)) as supervisor:
+            result, limit = supervisor.run("allocate")
+            after, after_limit = supervisor.run("after")
+        self.assertEqual(limit, "memory")
+        self.assertIsNone(result)
+        self.assertIsNone(after_limit)
+        self.assertEqual(after[0], "after")
+
+    def test_small_job_within_budget_is_not_flagged(self):
+        with song_worker.Supervisor(run_job, timeout=10, max_rss_mb=self.budget_above_current_rss(64)) as supervisor:
+            result, limit = supervisor.run("a")
+        self.assertIsNone(limit)
+        self.assertEqual(result[0], "a")
+
+    def test_budget_below_starting_rss_is_rejected(self):
+        with self.assertRaises(ValueError):
+            with song_worker.Supervisor(run_job, timeout=10, max_rss_mb=1):
+                pass
+
+    def test_crashed_worker_is_replaced(self):
+        with song_worker.Supervisor(run_job, timeout=10, max_rss_mb=0) as supervisor:
+            result, limit = supervisor.run("exit")
+            after, after_limit = supervisor.run("after")
+        self.assertEqual((result, limit), (None, "crashed"))
+        self.assertEqual(supervisor.exitcode, 3)
+        self.assertIsNone(after_limit)
+
+if __name__ == "__main__":
+    unittest.main()
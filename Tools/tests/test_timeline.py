@@ -0,0 +1,48 @@
+import unittest
+import os
+import sys
+
+# Add the Generators directory to the Python module search path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Generators')))
+import Generators.timeline as timeline
+
+class TestTimeline(unittest.TestCase):
+    def test_build_timeline_uses_per_chord_durations(self):
+        song = timeline.build_timeline({
+            "tempo": 96,
+            "meter": "6/8",
+            "midi_duration": 3,
+            "sections": [
+                {"title": "Verse", "progression": ["D", "G", "D"], "durations": [1.5], "lyrics": ["a"]},
+                {"title": "Chorus", "progression": ["G"], "lyrics": []},
+            ],
+        })
+        self.assertEqual((song.tempo, song.meter, song.measure_ticks), (96, "6/8", 2880))
+        self.assertEqual(list(song.onsets), [0, 1440, 4320, 7200])
+        self.assertEqual(list(song.durations), [1440, 2880, 2880, 2880])
+        self.assertEqual(song.chord_names, ["D", "G"])
+        self.assertEqual(list(song.chord_ids), [0, 1, 0, 1])
+        self.assertEqual(song.sections[1], ("Chorus", 3, 4, []))
+        self.assertEqual(song.section_events(1), ((1, 2880),))
+        self.assertEqual(song.section_span(0), (0, 7200))
+        self.assertEqual(song.section_span(1), (7200, 10080))
+
+    def test_build_timeline_defaults_to_one_chord_per_measure(self):
+        song = timeline.build_timeline({"abc_notation": {"meter": "3/4", "tempo": "1/4=80", "sections": [
+            {"title": "A", "chords": ["C", "F"], "lyrics": []},
+        ]}})
+        self.assertEqual((song.tempo, song.meter), (80, "3/4"))
+        self.assertEqual(list(song.durations), [2880, 2880])
+
+    def test_build_timeline_falls_back_to_midi_progression(self):
+        song = timeline.build_timeline({"midi_duration": 1, "midi_progression": ["D", "A"]})
+        self.assertEqual(list(song.onsets), [0, 960])
+        self.assertEqual(len(song), 2)
+
+    def test_parse_meter_rejects_invalid_values(self):
+        self.assertEqual(timeline.parse_meter("C"), (4, 4))
+        self.assertEqual(timeline.parse_meter("0/4"), (4, 4))
+        self.assertEqual(timeline.parse_meter(None), (4, 4))
+
+if __name__ == "__main__":
+    unittest.main()